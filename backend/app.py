@@ -1,18 +1,32 @@
-from flask import Flask, request, jsonify
+if __name__ == "__main__":
+    # `python app.py` serves through run.py, which imports this file as the "app" module.
+    # Bulk upload parse workers re-import the __main__ script, so the app's setup
+    # (models, registry, job pool, scheduler) must not live in it.
+    import os
+    import runpy
+    runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), "run.py"), run_name="__main__")
+    raise SystemExit
+
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import os
+import time
 import atexit
 import shutil
 import json
 from dotenv import load_dotenv
 from datetime import datetime
 from upload_document import DocumentUploader
+from retriever_manager import RetrieverManager
+from chat_stream import stream_answer, stream_cached_answer, format_context
+from semantic_cache import SemanticCache
+from ingestion_jobs import IngestionJobQueue, QueueFull, DuplicateDocument
+from document_registry import DocumentRegistry
+from metrics import StageMetrics
+from upload_stream import UploadRequest
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_community.vectorstores import FAISS
-from langchain.chains import RetrievalQA
 from langchain.prompts import ChatPromptTemplate
 import csv
-from hashlib import md5
 from apscheduler.schedulers.background import BackgroundScheduler
 
 app = Flask(__name__)
@@ -37,37 +51,30 @@ TEMP_DIR = "temp"
 QUERIES_FILE = "saved_queries.json"
 FEEDBACK_DB = "feedback_logs.csv"
 BACKUP_DIR = "feedback_backups"
-DOCUMENTS_LIST_FILE = "uploaded_documents.json"
+DOCUMENTS_LIST_FILE = "uploaded_documents.json"  # legacy registry, imported into DOCUMENTS_DB once
+DOCUMENTS_DB = "uploaded_documents.db"
+DOCUMENTS_PAGE_SIZE = 50
+DOCUMENTS_MAX_PAGE_SIZE = 500
+SEMANTIC_CACHE_THRESHOLD = 0.95
+SEMANTIC_CACHE_MAX_ENTRIES = 1000
+SEMANTIC_CACHE_TTL = 24 * 3600
+INDEX_COMPACTION_INTERVAL_MINUTES = 10
+INDEX_COMPACTION_MIN_DELTAS = 4
+INGESTION_WORKERS = 2
+INGESTION_MAX_PENDING = 100
 
 load_dotenv()
 os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
 
 # Initialize components
-uploader = DocumentUploader(vectorstore_directory=VECTORSTORE_DIRECTORY)
+# Per-stage latency histograms of chat requests and uploads, served by /api/metrics
+stage_metrics = StageMetrics()
+uploader = DocumentUploader(vectorstore_directory=VECTORSTORE_DIRECTORY, metrics=stage_metrics)
 llm = ChatOpenAI(model="gpt-4o", temperature=0.1)
 embeddings = OpenAIEmbeddings()
 
-# Document tracking functions
-def load_uploaded_documents():
-    try:
-        with open(DOCUMENTS_LIST_FILE, 'r') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return []
-
-def save_uploaded_document(filename, file_hash):
-    documents = load_uploaded_documents()
-    documents.append({
-        "filename": filename,
-        "hash": file_hash,
-        "upload_time": datetime.now().isoformat()
-    })
-    with open(DOCUMENTS_LIST_FILE, 'w') as f:
-        json.dump(documents, f)
-
-def get_file_hash(file_path):
-    with open(file_path, 'rb') as f:
-        return md5(f.read()).hexdigest()
+# Document tracking
+document_registry = DocumentRegistry(DOCUMENTS_DB, legacy_json_path=DOCUMENTS_LIST_FILE)
 
 # Ensure directories exist
 os.makedirs(BACKUP_DIR, exist_ok=True)
@@ -85,6 +92,12 @@ def backup_feedback():
 # Initialise backup scheduler
 scheduler = BackgroundScheduler()
 scheduler.add_job(backup_feedback, 'cron', hour=0)
+# Merge uploaded delta shards into the base index in the background
+scheduler.add_job(
+    uploader.index.compact, 'interval',
+    minutes=INDEX_COMPACTION_INTERVAL_MINUTES,
+    kwargs={"min_deltas": INDEX_COMPACTION_MIN_DELTAS}
+)
 scheduler.start()
 
 # Query Storage Functions
@@ -109,8 +122,32 @@ If the context does not contain the answer, use other sources.
 """
 prompt = ChatPromptTemplate.from_template(prompt_template)
 
+# Resident vectorstore, reloaded only when the uploader writes a new index
+retriever_manager = RetrieverManager(
+    vectorstore_directory=VECTORSTORE_DIRECTORY,
+    embeddings=embeddings
+)
+
+# Background ingestion of uploaded documents
+ingestion_jobs = IngestionJobQueue(
+    uploader,
+    max_workers=INGESTION_WORKERS,
+    max_pending=INGESTION_MAX_PENDING,
+    on_success=document_registry.add,
+    is_indexed=document_registry.exists
+)
+
+# Answers to previously asked (similar) questions, dropped when the index changes
+semantic_cache = SemanticCache(
+    threshold=SEMANTIC_CACHE_THRESHOLD,
+    max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+    ttl_seconds=SEMANTIC_CACHE_TTL
+)
+
 # Cleanup function
 def cleanup_temp():
+    ingestion_jobs.shutdown()
+    uploader.shutdown()
     if os.path.exists(TEMP_DIR):
         shutil.rmtree(TEMP_DIR)
     if scheduler.running:
@@ -118,41 +155,100 @@ def cleanup_temp():
 
 atexit.register(cleanup_temp)
 
+# Uploaded files are written to TEMP_DIR and hashed while the request body is parsed
+UploadRequest.temp_dir = TEMP_DIR
+UploadRequest.upload_paths = ('/api/upload_document', '/api/upload_documents')
+app.request_class = UploadRequest
+
+@app.teardown_request
+def discard_unclaimed_uploads(exc):
+    # Uploads not handed to an ingestion job (rejected, duplicate or failed) are removed
+    for stream in getattr(request, 'upload_streams', []):
+        if not stream.claimed:
+            stream.discard()
+
 # API Endpoints
 @app.route('/api/upload_document', methods=['POST'])
 def upload_document():
-    if 'file' not in request.files:
+    # Parsing the form receives and hashes the file
+    with stage_metrics.timer("upload", "receive"):
+        files = request.files
+    if 'file' not in files:
         return jsonify({"error": "No file uploaded"}), 400
 
-    file = request.files['file']
+    file = files['file']
     if not file.filename:
         return jsonify({"error": "Empty file name"}), 400
 
     try:
-        os.makedirs(TEMP_DIR, exist_ok=True)
-        temp_path = os.path.join(TEMP_DIR, file.filename)
-        file.save(temp_path)
+        temp_path, current_hash = file.stream.finish()
         
-        # Check for duplicates
-        current_hash = get_file_hash(temp_path)
-        existing_docs = load_uploaded_documents()
-        
-        if any(doc['hash'] == current_hash for doc in existing_docs):
-            os.remove(temp_path)
-            return jsonify({"error": "File already exists in database"}), 409
-        
-        # Process new file
-        uploader.upload_documents([temp_path])
-        save_uploaded_document(file.filename, current_hash)
-        os.remove(temp_path)
+        # Process new file in the background; the queue atomically rejects files
+        # already indexed or still being processed
+        try:
+            job_id = ingestion_jobs.submit(temp_path, file.filename, current_hash)
+        except DuplicateDocument as e:
+            return jsonify({"error": str(e)}), 409
+        except QueueFull as e:
+            return jsonify({"error": str(e)}), 503
+        file.stream.claimed = True
         
         return jsonify({
-            "message": "Document processed successfully",
-            "filename": file.filename
-        }), 200
+            "message": "Document queued for processing",
+            "filename": file.filename,
+            "job_id": job_id,
+            "status_url": f"/api/upload_status/{job_id}"
+        }), 202
     except Exception as e:
         return jsonify({"error": f"Document processing failed: {str(e)}"}), 500
 
+@app.route('/api/upload_documents', methods=['POST'])
+def upload_documents():
+    # Parsing the form receives and hashes the files
+    with stage_metrics.timer("upload_bulk", "receive"):
+        uploads = request.files.getlist('files')
+    files = [file for file in uploads if file.filename]
+    if not files:
+        return jsonify({"error": "No files uploaded"}), 400
+
+    queued = []
+    streams = {}
+    try:
+        for file in files:
+            temp_path, current_hash = file.stream.finish()
+            streams[temp_path] = file.stream
+            queued.append((temp_path, file.filename, current_hash))
+
+        # Duplicates (within the request, indexed or being processed) are left out atomically
+        try:
+            job_id, duplicates = ingestion_jobs.submit_bulk(queued)
+        except DuplicateDocument as e:
+            duplicates, job_id = e.files, None
+        rejected = [{"file": filename, "status": "duplicate"} for _, filename, _ in duplicates]
+        queued = [file for file in queued if file not in duplicates]
+        for temp_path, _, _ in queued:
+            streams[temp_path].claimed = True
+        if job_id is None:
+            return jsonify({"error": "All files already exist in database", "files": rejected}), 409
+
+        return jsonify({
+            "message": f"{len(queued)} documents queued for processing",
+            "files": [{"file": filename, "status": "queued"} for _, filename, _ in queued] + rejected,
+            "job_id": job_id,
+            "status_url": f"/api/upload_status/{job_id}"
+        }), 202
+    except Exception as e:
+        if isinstance(e, QueueFull):
+            return jsonify({"error": str(e)}), 503
+        return jsonify({"error": f"Document processing failed: {str(e)}"}), 500
+
+@app.route('/api/upload_status/<job_id>', methods=['GET'])
+def upload_status(job_id):
+    job = ingestion_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job id"}), 404
+    return jsonify(job), 200
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     data = request.json
@@ -163,36 +259,91 @@ def chat():
         return jsonify({"error": "Empty message"}), 400
 
     try:
-        if not os.path.exists(os.path.join(VECTORSTORE_DIRECTORY, "index.faiss")):
+        started = time.perf_counter()
+        with stage_metrics.timer("chat", "index_load"):
+            state = retriever_manager.get()
+        if state is None:
             return jsonify({"error": "No documents uploaded yet"}), 404
-
-        print("Loading vectorstore...")
-        vectorstore = FAISS.load_local(
-            folder_path=VECTORSTORE_DIRECTORY,
-            embeddings=embeddings,
-            allow_dangerous_deserialization=True
-        )
-        print("Vectorstore loaded successfully.")
-
-        print("Initializing QA chain...")
-        qa_chain = RetrievalQA.from_chain_type(
-            llm=llm,
-            chain_type="stuff",
-            retriever=vectorstore.as_retriever(search_kwargs={"k": 5}),
-            chain_type_kwargs={"prompt": prompt},
-            return_source_documents=False
-        )
-        print("QA chain initialized successfully.")
+        generation, vectorstore = state
 
         print(f"Processing query: {user_message}")
-        response = qa_chain.invoke({"query": user_message})
-        print(f"Query processed successfully. Response: {response}")
+        with stage_metrics.timer("chat", "query_embedding"):
+            query_vector = embeddings.embed_query(user_message)
+        with stage_metrics.timer("chat", "cache_lookup"):
+            cached_answer = semantic_cache.lookup(query_vector, generation)
+        if cached_answer is not None:
+            print("Semantic cache hit.")
+            with stage_metrics.timer("chat", "response_serialization"):
+                response = jsonify({"response": cached_answer})
+            stage_metrics.observe("chat", "total", time.perf_counter() - started)
+            return response, 200
+
+        with stage_metrics.timer("chat", "vector_search"):
+            documents = vectorstore.similarity_search_by_vector(query_vector, k=retriever_manager.k)
+        # Same prompt as the "stuff" chain, built here so it is timed apart from the LLM call
+        with stage_metrics.timer("chat", "prompt_build"):
+            messages = prompt.format_messages(context=format_context(documents), question=user_message)
+        with stage_metrics.timer("chat", "llm_call"):
+            answer = llm.invoke(messages).content
+        semantic_cache.store(user_message, query_vector, answer, generation)
+        print(f"Query processed successfully. Response: {answer}")
+
+        with stage_metrics.timer("chat", "response_serialization"):
+            response = jsonify({"response": answer})
+        stage_metrics.observe("chat", "total", time.perf_counter() - started)
+        return response, 200
+    except Exception as e:
+        print(f"Error during query processing: {str(e)}")
+        return jsonify({"error": f"Failed to process query: {str(e)}"}), 500
 
-        return jsonify({"response": response["result"]}), 200
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    data = request.json
+    print("Received data:", data)
+    user_message = data.get("message", {}).get("text", "").strip()
+
+    if not user_message:
+        return jsonify({"error": "Empty message"}), 400
+
+    try:
+        state = retriever_manager.get()
+        if state is None:
+            return jsonify({"error": "No documents uploaded yet"}), 404
+        generation, vectorstore = state
+        query_vector = embeddings.embed_query(user_message)
     except Exception as e:
         print(f"Error during query processing: {str(e)}")
         return jsonify({"error": f"Failed to process query: {str(e)}"}), 500
 
+    print(f"Streaming query: {user_message}")
+    cached_answer = semantic_cache.lookup(query_vector, generation)
+    if cached_answer is not None:
+        print("Semantic cache hit.")
+        events = stream_cached_answer(cached_answer)
+    else:
+        events = stream_answer(
+            llm, prompt, vectorstore, user_message,
+            k=retriever_manager.k,
+            query_vector=query_vector,
+            on_answer=lambda answer: semantic_cache.store(user_message, query_vector, answer, generation)
+        )
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route('/api/cache_stats', methods=['GET'])
+def cache_stats():
+    return jsonify(semantic_cache.stats()), 200
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    # Prometheus text format by default; ?format=json gives p50/p95/p99 per stage
+    if request.args.get('format') == 'json':
+        return jsonify(stage_metrics.summary()), 200
+    return Response(stage_metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/save_query', methods=['POST'])
 def save_query():
     data = request.json
@@ -214,7 +365,22 @@ def get_queries():
 
 @app.route('/api/get_documents', methods=['GET'])
 def get_documents():
-    return jsonify(load_uploaded_documents()), 200
+    # Without paging parameters the full list is returned, as before
+    if 'page' not in request.args and 'page_size' not in request.args:
+        return jsonify(document_registry.list()), 200
+
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        page_size = min(DOCUMENTS_MAX_PAGE_SIZE, max(1, int(request.args.get('page_size', DOCUMENTS_PAGE_SIZE))))
+    except ValueError:
+        return jsonify({"error": "page and page_size must be integers"}), 400
+
+    return jsonify({
+        "documents": document_registry.list(offset=(page - 1) * page_size, limit=page_size),
+        "page": page,
+        "page_size": page_size,
+        "total": document_registry.count()
+    }), 200
 
 @app.route('/api/log_feedback', methods=['POST'])
 def log_feedback():
@@ -242,6 +408,3 @@ def log_feedback():
 @app.route('/api/test')
 def test():
     return jsonify({"message": "Test successful"}), 200
-
-if __name__ == '__main__':
-    app.run(port=5000, debug=True)
\ No newline at end of file
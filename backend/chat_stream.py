@@ -0,0 +1,63 @@
+from typing import Iterator, List, Optional
+import json
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Format a single server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def format_context(documents: List) -> str:
+    """Join retrieved chunks the same way the "stuff" chain does."""
+    return "\n\n".join(doc.page_content for doc in documents)
+
+
+def stream_answer(llm, prompt, vectorstore, question: str, k: int = 5,
+                  query_vector: Optional[List[float]] = None, on_answer=None) -> Iterator[str]:
+    """
+    Answer a question as a stream of server-sent events.
+
+    Emits a "retrieval" event once the context chunks are found, one "token"
+    event per chunk yielded by the chat model, and a final "done" event whose
+    payload matches the JSON body of /api/chat. Any chat model supporting
+    .stream() works, e.g. langchain_core's FakeListChatModel(responses=[...],
+    sleep=0.05) for local testing.
+
+    Args:
+        llm: Chat model to stream tokens from
+        prompt: Prompt template with {context} and {question} variables
+        vectorstore: Vectorstore to retrieve context from
+        question: The user's question
+        k: Number of chunks retrieved (default: 5)
+        query_vector: Precomputed question embedding, to avoid embedding twice
+        on_answer: Called with the full answer once generation completes
+
+    Yields:
+        str: Encoded server-sent events
+    """
+    try:
+        if query_vector is not None:
+            documents = vectorstore.similarity_search_by_vector(query_vector, k=k)
+        else:
+            documents = vectorstore.similarity_search(question, k=k)
+        yield sse_event("retrieval", {"documents": len(documents)})
+
+        messages = prompt.format_messages(context=format_context(documents), question=question)
+        answer = ""
+        for chunk in llm.stream(messages):
+            if not chunk.content:
+                continue
+            answer += chunk.content
+            yield sse_event("token", {"token": chunk.content})
+
+        if on_answer:
+            on_answer(answer)
+        yield sse_event("done", {"response": answer})
+    except Exception as e:
+        print(f"Error during streamed query processing: {str(e)}")
+        yield sse_event("error", {"error": f"Failed to process query: {str(e)}"})
+
+
+def stream_cached_answer(answer: str) -> Iterator[str]:
+    """Replay a cached answer as a single "done" event."""
+    yield sse_event("done", {"response": answer})
@@ -0,0 +1,128 @@
+import time
+import hashlib
+from array import array
+from langchain_core.embeddings import Embeddings
+
+from .sqlite_store import SQLiteStore, batches
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache(SQLiteStore):
+    """On-disk cache of chunk embeddings keyed by (model name, content hash).
+
+    Backed by a single SQLite file so it can be shared between processes.
+    Vectors are stored as float32 blobs; once the cache holds more than
+    `max_entries` vectors the least recently used ones are evicted.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS embeddings ("
+        "model TEXT NOT NULL, hash TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL, "
+        "PRIMARY KEY (model, hash)) WITHOUT ROWID",
+        "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)",
+    )
+
+    def __init__(self, path, max_entries=2_000_000):
+        super().__init__(path)
+        self.max_entries = max_entries
+        self._count = None
+
+    def _opened(self, conn):
+        self._count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, model, hashes):
+        """Return a list of vectors (or None for misses) aligned with `hashes`."""
+        found = {}
+        with self._lock:
+            conn = self._connect()
+            unique = list(dict.fromkeys(hashes))
+            for batch in batches(unique):
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({placeholders})",
+                    [model, *batch],
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = array("f", blob).tolist()
+            if found:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND hash = ?",
+                    [(now, model, h) for h in found],
+                )
+                conn.commit()
+        return [found.get(h) for h in hashes]
+
+    def put_many(self, model, hashes, vectors):
+        """Store vectors for the given content hashes, evicting old entries if needed."""
+        now = time.time()
+        rows = [(model, h, array("f", v).tobytes(), now) for h, v in zip(hashes, vectors)]
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            conn.commit()
+            self._count += len(rows)
+            if self._count > self.max_entries:
+                self._evict(conn)
+
+    def _evict(self, conn):
+        self._count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = self._count - self.max_entries
+        if excess <= 0:
+            return
+        conn.execute(
+            "DELETE FROM embeddings WHERE (model, hash) IN "
+            "(SELECT model, hash FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        conn.commit()
+        self._count -= excess
+
+    def __len__(self):
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only calls the underlying model for uncached chunks."""
+
+    def __init__(self, embeddings, cache, model_name=None):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = (
+            model_name
+            or getattr(embeddings, "model", None)
+            or getattr(embeddings, "model_name", None)
+            or type(embeddings).__name__
+        )
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts):
+        hashes = [content_hash(t) for t in texts]
+        vectors = self.cache.get_many(self.model_name, hashes)
+
+        missing = {}
+        for i, (h, v) in enumerate(zip(hashes, vectors)):
+            if v is None:
+                missing.setdefault(h, []).append(i)
+        self.hits += len(texts) - sum(len(idx) for idx in missing.values())
+        self.misses += sum(len(idx) for idx in missing.values())
+
+        if missing:
+            missing_hashes = list(missing)
+            new_vectors = self.embeddings.embed_documents([texts[missing[h][0]] for h in missing_hashes])
+            self.cache.put_many(self.model_name, missing_hashes, new_vectors)
+            for h, v in zip(missing_hashes, new_vectors):
+                for i in missing[h]:
+                    vectors[i] = v
+        return vectors
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
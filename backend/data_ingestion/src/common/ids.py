@@ -0,0 +1,6 @@
+import hashlib
+
+
+def make_id(doc_path):
+    """Chunk id prefix of a document: 12 hex digits of the md5 of its path without the 32-character bucket prefix."""
+    return hashlib.md5(doc_path[32:].encode("utf-8")).hexdigest()[:12]
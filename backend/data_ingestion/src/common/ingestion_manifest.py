@@ -0,0 +1,67 @@
+import time
+
+from .sqlite_store import SQLiteStore, batches
+
+
+class IngestionManifest(SQLiteStore):
+    """Durable per-document record of an ingestion run, used to resume after a crash.
+
+    Each document has a status ("done" or "failed"), its chunk count, the hash of
+    the source it was built from and the time it was last updated. Backed by a
+    single SQLite file so all worker processes of a run can share it.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS documents ("
+        "doc_path TEXT PRIMARY KEY, status TEXT NOT NULL, chunks INTEGER, "
+        "content_hash TEXT, error TEXT, updated_at REAL NOT NULL) WITHOUT ROWID",
+    )
+
+    def get_many(self, doc_paths):
+        """Return {doc_path: {"status", "chunks", "content_hash", "updated_at"}} for known documents."""
+        found = {}
+        with self._lock:
+            conn = self._connect()
+            unique = list(dict.fromkeys(doc_paths))
+            for batch in batches(unique):
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    "SELECT doc_path, status, chunks, content_hash, updated_at FROM documents "
+                    f"WHERE doc_path IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for doc_path, status, chunks, content_hash, updated_at in rows:
+                    found[doc_path] = {
+                        "status": status, "chunks": chunks, "content_hash": content_hash, "updated_at": updated_at
+                    }
+        return found
+
+    def mark_done(self, records):
+        """Record (doc_path, content_hash, chunks) tuples as stored."""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO documents (doc_path, status, chunks, content_hash, error, updated_at) "
+                "VALUES (?, 'done', ?, ?, NULL, ?)",
+                [(doc_path, chunks, content_hash, now) for doc_path, content_hash, chunks in records],
+            )
+            conn.commit()
+
+    def mark_failed(self, records):
+        """Record (doc_path, content_hash, error) tuples as failed, to be retried on the next run.
+
+        Documents already done keep their record: their stored chunks are still
+        valid, and their chunk count is needed to clean up those chunks later.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT INTO documents (doc_path, status, chunks, content_hash, error, updated_at) "
+                "VALUES (?, 'failed', NULL, ?, ?, ?) "
+                "ON CONFLICT(doc_path) DO UPDATE SET status = 'failed', content_hash = excluded.content_hash, "
+                "error = excluded.error, updated_at = excluded.updated_at WHERE status != 'done'",
+                [(doc_path, content_hash, error, now) for doc_path, content_hash, error in records],
+            )
+            conn.commit()
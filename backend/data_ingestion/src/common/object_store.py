@@ -0,0 +1,101 @@
+import os
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class S3ObjectStore:
+    """Objects in an S3 bucket, addressed by key."""
+
+    def __init__(self, bucket, client=None, max_pool_connections=16):
+        self.bucket = bucket
+        self.max_pool_connections = max_pool_connections
+        if client is None:
+            import boto3
+            from botocore.config import Config
+            client = boto3.client(
+                's3',
+                aws_access_key_id=os.getenv("S3_ACCESS_KEY_ID"),
+                aws_secret_access_key=os.getenv("S3_SECRET_ACCESS_KEY"),
+                config=Config(max_pool_connections=max_pool_connections)
+            )
+        self.client = client
+
+    def list(self, prefix="", batch_size=1000):
+        """Yield lists of up to `batch_size` keys starting with `prefix`."""
+        paginator = self.client.get_paginator("list_objects_v2")
+        pages = paginator.paginate(Bucket=self.bucket, Prefix=prefix, PaginationConfig={"PageSize": batch_size})
+        keys = (obj["Key"] for page in pages for obj in page.get("Contents", []))
+        yield from batched(keys, batch_size)
+
+    def get(self, key):
+        return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+
+    def version(self, key):
+        """Cheap identifier of an object's current content (its ETag)."""
+        return self.client.head_object(Bucket=self.bucket, Key=key)["ETag"]
+
+    def get_many(self, keys):
+        """Bodies of `keys` in order, fetched concurrently over the client's connection pool."""
+        keys = list(keys)
+        if len(keys) <= 1:
+            return [self.get(key) for key in keys]
+        with ThreadPoolExecutor(max_workers=min(len(keys), self.max_pool_connections)) as pool:
+            return list(pool.map(self.get, keys))
+
+
+class LocalObjectStore:
+    """Objects stored as files under a root directory, using the S3 key as relative path."""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def path(self, key):
+        return os.path.join(self.root, *key.split("/"))
+
+    def list(self, prefix="", batch_size=1000):
+        """Yield lists of up to `batch_size` keys starting with `prefix`, in sorted order."""
+        def walk(directory):
+            with os.scandir(directory) as entries:
+                for entry in sorted(entries, key=lambda e: e.name):
+                    if entry.is_dir(follow_symlinks=False):
+                        yield from walk(entry.path)
+                    else:
+                        yield os.path.relpath(entry.path, self.root).replace(os.sep, "/")
+
+        # Only walk the directory part of the prefix, then filter on the full prefix
+        start = self.path(prefix.rsplit("/", 1)[0]) if "/" in prefix else self.root
+        if not os.path.isdir(start):
+            return
+        yield from batched((key for key in walk(start) if key.startswith(prefix)), batch_size)
+
+    def get(self, key):
+        with open(self.path(key), "rb") as f:
+            return f.read()
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+    def version(self, key):
+        """Cheap identifier of a file's current content (size and modification time)."""
+        stat = os.stat(self.path(key))
+        return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def open_object_store(max_pool_connections=16):
+    """Object store selected by EU_OBJECT_STORE ("s3" or "local").
+
+    The S3 bucket is EU_S3_BUCKET (default "regguru"); local objects are read
+    from EU_OBJECT_STORE_PATH, laid out like the bucket keys.
+    """
+    backend = os.getenv("EU_OBJECT_STORE", "s3").lower()
+    if backend == "s3":
+        return S3ObjectStore(os.getenv("EU_S3_BUCKET", "regguru"), max_pool_connections=max_pool_connections)
+    if backend == "local":
+        return LocalObjectStore(os.getenv("EU_OBJECT_STORE_PATH", "."))
+    raise ValueError(f"Unknown EU_OBJECT_STORE: {backend}")
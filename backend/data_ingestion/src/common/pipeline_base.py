@@ -1,8 +1,40 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import pickle
+import hashlib
+import queue
+import time
+from common.stage_cache import StageCache, cache_key, code_version
+
+# Marks the end of a stage's output in streaming mode
+END = object()
+
+# region -> pipeline class, filled by @register_pipeline and run by pipelines/run_all.py
+PIPELINES = {}
+
+
+def register_pipeline(cls):
+    """Class decorator adding a region pipeline to the registry."""
+    PIPELINES[cls.region] = cls
+    return cls
+
 
 class IngestionPipeline(ABC):
     """Base class for all region-specific pipelines."""
 
+    region = None
+    # Threads running process() and embed() over slices of their input
+    stage_workers = {"process": 1, "embed": 1}
+    # Streaming mode: items flow through bounded queues instead of whole lists
+    streaming = False
+    queue_size = 64
+    embed_batch_size = 256
+    # Content-addressed cache of process() output and embedded docs; None disables it
+    cache_dir = None
+    # Explicit stage versions; by default a stage is versioned by the hash of its source code
+    stage_versions = {}
+
     @abstractmethod
     def ingest(self):
         """Download or read raw data (return list of file paths or bytes)."""
@@ -18,7 +50,241 @@ class IngestionPipeline(ABC):
         """Embed documents into Chroma or other vector DB."""
         pass
 
-    def run(self):
-        raw = self.ingest()
-        docs = self.process(raw)
-        self.embed(docs)
+    def iter_ingest(self):
+        """Yield raw items as they become available (streaming mode); defaults to ingest()."""
+        yield from self.ingest()
+
+    def process_item(self, raw_item):
+        """Structured docs for a single raw item (streaming mode); defaults to process([raw_item])."""
+        return self.process([raw_item])
+
+    def stage_config(self, stage):
+        """Settings that change a stage's output (e.g. chunk size, model); part of its cache key."""
+        return {}
+
+    def item_fingerprint(self, raw_item):
+        """Identifies the content of a raw item. Override when items are references (paths, keys)."""
+        return hashlib.sha256(pickle.dumps(raw_item)).hexdigest()
+
+    def embed_target_state(self):
+        """Identifies the current state of embed()'s target, e.g. the id of a vector collection.
+
+        Docs are only skipped as embedded while it is unchanged, so a deleted or
+        rebuilt target is filled again. None (the default) disables caching of embed().
+        """
+        return None
+
+    def doc_fingerprint(self, doc):
+        return hashlib.sha256(pickle.dumps(doc)).hexdigest()
+
+    def stage_key(self, stage, fingerprint):
+        """Cache key of a stage's output for one input: (input fingerprint, stage code version, config)."""
+        version = self.stage_versions.get(stage)
+        if version is None:
+            functions = {"process": (type(self).process, type(self).process_item), "embed": (type(self).embed,)}
+            version = code_version(*functions[stage])
+        return cache_key(self.region, stage, fingerprint, version, self.stage_config(stage))
+
+    def _count_cached(self, stage, n):
+        with self._cache_lock:
+            self._cache_hits[stage] += n
+
+    def cached_process_item(self, raw_item):
+        """process_item(), reusing the cached docs if the item, code and config are unchanged."""
+        if self._cache is None:
+            return self.process_item(raw_item) or []
+        key = self.stage_key("process", self.item_fingerprint(raw_item))
+        docs = self._cache.get(key)
+        if docs is not None:
+            self._count_cached("process", 1)
+            return docs
+        docs = self.process_item(raw_item) or []
+        self._cache.put(key, docs)
+        return docs
+
+    def cached_process(self, raw_data):
+        if self._cache is None:
+            return self.process(raw_data)
+        return [doc for raw_item in raw_data for doc in self.cached_process_item(raw_item)]
+
+    def cached_embed(self, docs):
+        """embed() only docs not already embedded into the same target state with the same code and config."""
+        target = self.embed_target_state() if self._cache is not None else None
+        if target is None:
+            return self.embed(docs)
+        keys = [self.stage_key("embed", self.doc_fingerprint(doc)) for doc in docs]
+        todo = [(doc, key) for doc, key in zip(docs, keys) if self._cache.get(key) != target]
+        self._count_cached("embed", len(docs) - len(todo))
+        output = self.embed([doc for doc, _ in todo]) if todo else []
+        for _, key in todo:
+            self._cache.put(key, target)
+        return output
+
+    def _open_cache(self, use_cache):
+        self._cache = StageCache(self.cache_dir) if use_cache and self.cache_dir else None
+        self._cache_hits = {"process": 0, "embed": 0}
+        self._cache_lock = threading.Lock()
+
+    def run_stage(self, stage, func, items, workers=1, progress=None):
+        """Run func over items, split into slices handled by `workers` threads.
+
+        The outputs of the slices are concatenated in input order.
+        """
+        if workers <= 1 or len(items) <= 1:
+            return func(items)
+        # A few slices per worker so progress is reported and uneven slices balance out
+        size = max(1, -(-len(items) // (workers * 4)))
+        slices = [items[start:start + size] for start in range(0, len(items), size)]
+        results = []
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for done, output in enumerate(pool.map(func, slices), 1):
+                results.extend(output or [])
+                if progress:
+                    progress(self.region, stage, done=done, total=len(slices))
+        return results
+
+    def run(self, stage_workers=None, progress=None, streaming=None, use_cache=True):
+        """Run ingest, process and embed, returning per-stage timings and item counts.
+
+        Args:
+            stage_workers: Overrides of the class's stage_workers, e.g. {"process": 8}
+            progress: Called as progress(region, stage, **info) as stages advance
+            streaming: Use run_streaming() (default: the class's streaming attribute)
+            use_cache: Reuse cached stage output from cache_dir, if set (default: True)
+        """
+        workers = {**self.stage_workers, **(stage_workers or {})}
+        self._open_cache(use_cache)
+        if self.streaming if streaming is None else streaming:
+            return self.run_streaming(workers, progress)
+        report = {"region": self.region, "stages": {}}
+
+        def timed(stage, run_stage, items_in):
+            if progress:
+                progress(self.region, stage, started=True)
+            started = time.perf_counter()
+            output = run_stage()
+            report["stages"][stage] = {
+                "seconds": round(time.perf_counter() - started, 3),
+                "items_in": items_in,
+                "items_out": len(output) if output is not None else None
+            }
+            return output
+
+        raw = timed("ingest", self.ingest, None)
+        docs = timed("process", lambda: self.run_stage("process", self.cached_process, raw, workers["process"], progress), len(raw))
+        timed("embed", lambda: self.run_stage("embed", self.cached_embed, docs, workers["embed"], progress), len(docs))
+        for stage, hits in self._cache_hits.items():
+            report["stages"][stage]["cached"] = hits
+        return report
+
+    def run_streaming(self, stage_workers=None, progress=None):
+        """Run the stages concurrently, connected by bounded queues.
+
+        iter_ingest() feeds raw items to stage_workers["process"] threads calling
+        process_item(); their docs are grouped into batches of embed_batch_size
+        for embed(). A full queue blocks the stage feeding it, so memory is
+        bounded by the queue sizes rather than the corpus. The first error in
+        any stage stops the run and is raised here.
+        """
+        workers = max(1, {**self.stage_workers, **(stage_workers or {})}.get("process", 1))
+        if not hasattr(self, "_cache"):
+            self._open_cache(True)
+        raw_queue = queue.Queue(maxsize=self.queue_size)
+        doc_queue = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        errors = []
+        stats = {stage: {"seconds": 0.0, "items_in": 0, "items_out": 0} for stage in ("ingest", "process", "embed")}
+        stats_lock = threading.Lock()
+
+        def record(stage, seconds, items_in=0, items_out=0):
+            with stats_lock:
+                stats[stage]["seconds"] += seconds
+                stats[stage]["items_in"] += items_in
+                stats[stage]["items_out"] += items_out
+
+        def put(q, item):
+            # Give up instead of blocking forever once another stage has failed
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def get(q):
+            while not stop.is_set():
+                try:
+                    return q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            return END
+
+        def guarded(func):
+            def wrapper():
+                try:
+                    func()
+                except Exception as e:
+                    errors.append(e)
+                    stop.set()
+            return wrapper
+
+        def ingest():
+            items = iter(self.iter_ingest())
+            while True:
+                started = time.perf_counter()
+                item = next(items, END)
+                if item is END:
+                    break
+                record("ingest", time.perf_counter() - started, items_out=1)
+                if not put(raw_queue, item):
+                    return
+            for _ in range(workers):
+                put(raw_queue, END)
+
+        def process():
+            while (item := get(raw_queue)) is not END:
+                started = time.perf_counter()
+                docs = self.cached_process_item(item)
+                record("process", time.perf_counter() - started, items_in=1, items_out=len(docs))
+                for doc in docs:
+                    if not put(doc_queue, doc):
+                        return
+            put(doc_queue, END)
+
+        def embed():
+            batch, finished = [], 0
+            while finished < workers:
+                doc = get(doc_queue)
+                if doc is END:
+                    if stop.is_set():
+                        return
+                    finished += 1
+                else:
+                    batch.append(doc)
+                if batch and (len(batch) >= self.embed_batch_size or finished == workers):
+                    started = time.perf_counter()
+                    output = self.cached_embed(batch)
+                    record("embed", time.perf_counter() - started, items_in=len(batch),
+                           items_out=len(output) if output is not None else 0)
+                    if progress:
+                        progress(self.region, "embed", done=stats["embed"]["items_in"], total=None)
+                    batch = []
+
+        if progress:
+            progress(self.region, "streaming", started=True)
+        threads = [threading.Thread(target=guarded(ingest), name=f"{self.region}-ingest")]
+        threads += [threading.Thread(target=guarded(process), name=f"{self.region}-process-{i}") for i in range(workers)]
+        threads.append(threading.Thread(target=guarded(embed), name=f"{self.region}-embed"))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+
+        for stage, timing in stats.items():
+            timing["seconds"] = round(timing["seconds"], 3)
+            if stage in self._cache_hits:
+                timing["cached"] = self._cache_hits[stage]
+        return {"region": self.region, "streaming": True, "stages": stats}
@@ -0,0 +1,64 @@
+import time
+import random
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+
+# S3 error codes of throttling and server-side failures
+TRANSIENT_ERROR_CODES = {"Throttling", "ThrottlingException", "SlowDown", "RequestTimeout",
+                         "RequestLimitExceeded", "InternalError", "ServiceUnavailable"}
+
+
+def is_transient(error):
+    """Whether an error is worth retrying: throttling, 5xx, connection or timeout errors.
+
+    Permanent errors such as a missing key or file fail immediately.
+    """
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):  # botocore ClientError
+        code = response.get("Error", {}).get("Code")
+        status = response.get("ResponseMetadata", {}).get("HTTPStatusCode") or 0
+        return code in TRANSIENT_ERROR_CODES or status == 429 or status >= 500
+    try:
+        from botocore.exceptions import ConnectionError as BotoConnectionError, HTTPClientError
+    except ImportError:
+        return False
+    return isinstance(error, (BotoConnectionError, HTTPClientError))
+
+
+def fetch_with_retry(fetch, item, retries=3, backoff=0.5, retryable=is_transient):
+    """Call fetch(item), retrying errors for which retryable(error) is true with exponential backoff and jitter."""
+    for attempt in range(retries + 1):
+        try:
+            return fetch(item)
+        except Exception as e:
+            if attempt == retries or not retryable(e):
+                raise
+            time.sleep(backoff * (2 ** attempt) * (0.5 + random.random()))
+
+
+def prefetch(items, fetch, max_in_flight=16, retries=3, backoff=0.5, retryable=is_transient):
+    """Yield (item, result, error) in input order, fetching up to `max_in_flight` items ahead.
+
+    Fetches run in a thread pool so network waits overlap with whatever the
+    consumer does with earlier results (parsing, embedding). At most
+    `max_in_flight` results are buffered, so memory stays bounded. `fetch` can
+    be any callable, e.g. a local file read in place of an S3 get. Only errors
+    accepted by `retryable` (default: is_transient) are retried.
+    """
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        in_flight = deque(
+            (item, pool.submit(fetch_with_retry, fetch, item, retries, backoff, retryable))
+            for item in islice(items, max_in_flight)
+        )
+        while in_flight:
+            item, future = in_flight.popleft()
+            for next_item in islice(items, 1):
+                in_flight.append((next_item, pool.submit(fetch_with_retry, fetch, next_item, retries, backoff, retryable)))
+            try:
+                yield item, future.result(), None
+            except Exception as e:
+                yield item, None, e
@@ -0,0 +1,77 @@
+import time
+import traceback
+from multiprocessing import Pool, current_process
+
+
+def split_units(df, unit_size, cost_column=None):
+    """Split a DataFrame into row slices of at most `unit_size` rows.
+
+    With `cost_column` (e.g. a file size), the most expensive units come first,
+    so the slowest ones do not start last and hold up the end of the run.
+    """
+    units = [df.iloc[start:start + unit_size] for start in range(0, len(df), unit_size)]
+    if cost_column and cost_column in df:
+        units.sort(key=lambda unit: unit[cost_column].fillna(0).sum(), reverse=True)
+    return units
+
+
+def run_unit(task):
+    batch_func, unit_id, rows, args = task
+    try:
+        return unit_id, batch_func(rows, *args), None
+    except Exception:
+        return unit_id, None, f"[{current_process().pid}] {traceback.format_exc()}"
+
+
+def run_parallel(batch_func, df, *args, num_processes=4, unit_size=100, cost_column=None,
+                 max_retries=1, on_result=None):
+    """Run batch_func(rows, *args) over small units of `df` with dynamic scheduling.
+
+    Replaces splitting `df` into one static batch per process: idle workers pull
+    the next unit as soon as they finish, so wall-clock time follows total work
+    rather than the slowest batch. Results are returned to (and errors collected
+    in) this process; failed units are retried up to `max_retries` times.
+
+    Args:
+        batch_func: Module-level function taking a DataFrame of rows (and *args)
+        df: Rows to process
+        num_processes: Worker processes (default: 4)
+        unit_size: Rows per work unit (default: 100)
+        cost_column: Optional column estimating the cost of each row
+        max_retries: Times a failed unit is resubmitted (default: 1)
+        on_result: Called with each unit's return value as units complete; the
+            values are then not kept, so a long run does not hold them all
+
+    Returns:
+        dict: {"results": [...], "errors": {unit_id: traceback}, "units": n, "done": n, "seconds": s}
+        where "results" is empty when `on_result` is given
+    """
+    units = dict(enumerate(split_units(df, unit_size, cost_column)))
+    results, errors = [], {}
+    done = 0
+    started = time.perf_counter()
+    pending = list(units)
+    with Pool(processes=num_processes) as pool:
+        for attempt in range(max_retries + 1):
+            if not pending:
+                break
+            tasks = ((batch_func, unit_id, units[unit_id], args) for unit_id in pending)
+            pending = []
+            for unit_id, result, error in pool.imap_unordered(run_unit, tasks, chunksize=1):
+                if error:
+                    errors[unit_id] = error
+                    pending.append(unit_id)
+                    print(f"Unit {unit_id} failed (attempt {attempt + 1}):\n{error}")
+                    continue
+                errors.pop(unit_id, None)
+                done += 1
+                if on_result:
+                    on_result(result)
+                else:
+                    results.append(result)
+                if done % max(1, len(units) // 20) == 0:
+                    print(f"{done}/{len(units)} units done in {time.perf_counter() - started:.1f}s")
+
+    elapsed = time.perf_counter() - started
+    print(f"Finished {done}/{len(units)} units in {elapsed:.1f}s ({len(errors)} failed)")
+    return {"results": results, "errors": errors, "units": len(units), "done": done, "seconds": elapsed}
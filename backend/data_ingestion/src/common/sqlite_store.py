@@ -0,0 +1,56 @@
+import os
+import sqlite3
+import threading
+
+# SQLite caps the number of bound parameters per statement
+MAX_BATCH = 500
+
+
+class SQLiteStore:
+    """Base for small stores backed by one SQLite file shared between processes.
+
+    Subclasses list their CREATE statements in `SCHEMA`. Each process opens its
+    own WAL-mode connection on first use, and instances can be pickled to send
+    them to multiprocessing workers.
+    """
+
+    SCHEMA = ()
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connect(self):
+        # Connections must not be shared across forked worker processes
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in self.SCHEMA:
+                self._conn.execute(statement)
+            self._conn.commit()
+            self._pid = os.getpid()
+            self._opened(self._conn)
+        return self._conn
+
+    def _opened(self, conn):
+        """Called once a process has opened its connection."""
+
+    def __getstate__(self):
+        # Each worker opens its own connection
+        state = self.__dict__.copy()
+        state.update(_conn=None, _pid=None, _lock=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+def batches(values):
+    """Split `values` into chunks small enough to bind in one IN (...) clause."""
+    for start in range(0, len(values), MAX_BATCH):
+        yield values[start:start + MAX_BATCH]
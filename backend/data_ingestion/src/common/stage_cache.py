@@ -0,0 +1,51 @@
+import os
+import pickle
+import hashlib
+import inspect
+import json
+
+
+def cache_key(*parts):
+    """sha256 of the JSON encoding of `parts` (anything that is not JSON becomes its str())."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def code_version(*functions):
+    """Hash of the source code of `functions`, so editing a stage invalidates its cached output."""
+    sources = []
+    for function in functions:
+        try:
+            sources.append(inspect.getsource(function))
+        except (OSError, TypeError):
+            sources.append(getattr(function, "__qualname__", repr(function)))
+    return hashlib.sha256("\n".join(sources).encode("utf-8")).hexdigest()[:16]
+
+
+class StageCache:
+    """Content-addressed store of pipeline stage outputs: one pickle file per key."""
+
+    def __init__(self, directory):
+        self.directory = os.path.abspath(directory)
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.pkl")
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
+
+    def get(self, key, default=None):
+        try:
+            with open(self.path(key), "rb") as f:
+                return pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return default
+
+    def put(self, key, value):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so concurrent stages never read a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
@@ -0,0 +1,131 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pandas as pd
+from common.rate_limit import TokenBucket
+from eu.eurlex import Eurlex
+
+CELEX_BASE_URL = "http://publications.europa.eu/resource/celex/"
+DATA_TYPES = ("title", "text", "ids", "notice")
+
+
+def is_failure(data_type, value):
+    """get_data reports failures in-band: 1, a bare status code, or a title made of a status code."""
+    if value == 1 or value is None:
+        return True
+    if data_type == "title":
+        value = value.get("title") if isinstance(value, dict) else value
+    return isinstance(value, str) and re.fullmatch(r"(NaN)?\d{3}", value) is not None
+
+
+def fetch_celex(eurlex, celex, data_types=DATA_TYPES, notice="tree", base_url=CELEX_BASE_URL, bucket=None):
+    """Fetch `data_types` of one CELEX number with Eurlex.get_data; raises if any of them failed."""
+    record = {"celex": celex}
+    for data_type in data_types:
+        if bucket:
+            bucket.acquire()
+        value = eurlex.get_data(base_url + celex, data_type, notice=notice if data_type == "notice" else None)
+        if is_failure(data_type, value):
+            raise RuntimeError(f"{data_type}: {value}")
+        record[data_type] = value
+    return record
+
+
+def read_done(output_path):
+    """CELEX numbers already in the output file, so an interrupted download resumes."""
+    if not os.path.exists(output_path):
+        return set()
+    done = set()
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["celex"])
+            except (ValueError, KeyError):
+                pass  # partial last line of an interrupted run
+    return done
+
+
+def bulk_download(celex_numbers, output_path, data_types=DATA_TYPES, notice="tree", max_concurrency=8,
+                  rate=10.0, base_url=CELEX_BASE_URL, eurlex=None, report_every=100):
+    """Fetch CELEX documents concurrently, appending one JSON line per document to `output_path` as it completes.
+
+    At most `max_concurrency` documents are in flight, and all requests share a
+    token bucket of `rate` requests/sec. Failed CELEX numbers are appended to
+    `<output_path>.failed` with their error; documents already in the output are skipped.
+    Returns {"done", "failed", "skipped", "seconds", "per_sec"}.
+    """
+    eurlex = eurlex or Eurlex(pool_size=max_concurrency)
+    bucket = TokenBucket(rate) if rate else None
+    done = read_done(output_path)
+    stats = {"done": 0, "failed": 0, "skipped": 0}
+    started = time.perf_counter()
+
+    def report():
+        elapsed = time.perf_counter() - started
+        print(f"{stats['done']} done, {stats['failed']} failed, {stats['skipped']} skipped "
+              f"({stats['done'] / elapsed if elapsed else 0:.1f} docs/sec)")
+
+    with open(output_path, "a", encoding="utf-8") as out, \
+            open(f"{output_path}.failed", "a", encoding="utf-8") as failed, \
+            ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        in_flight = {}
+
+        def collect(futures):
+            for future in futures:
+                celex = in_flight.pop(future)
+                try:
+                    out.write(json.dumps(future.result(), ensure_ascii=False) + "\n")
+                    stats["done"] += 1
+                except Exception as e:
+                    failed.write(json.dumps({"celex": celex, "error": f"{type(e).__name__}: {e}"}) + "\n")
+                    stats["failed"] += 1
+                if (stats["done"] + stats["failed"]) % report_every == 0:
+                    out.flush()
+                    report()
+
+        for celex in celex_numbers:
+            if celex in done:
+                stats["skipped"] += 1
+                continue
+            done.add(celex)
+            # Submit lazily so a long CELEX list is not turned into futures all at once
+            if len(in_flight) >= max_concurrency:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(finished)
+            in_flight[pool.submit(fetch_celex, eurlex, celex, data_types, notice, base_url, bucket)] = celex
+        collect(list(in_flight))
+
+    report()
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    stats["per_sec"] = round(stats["done"] / stats["seconds"], 2) if stats["seconds"] else None
+    return stats
+
+
+def read_celex_numbers(csv_path, column="celex"):
+    celex = pd.read_csv(csv_path, usecols=[column])[column].dropna().astype(str)
+    return celex.drop_duplicates().tolist()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download EUR-Lex documents for a list of CELEX numbers.")
+    parser.add_argument("csv", help="CSV with a celex column, e.g. legal_act_celex.csv")
+    parser.add_argument("output", help="JSON lines file the documents are appended to")
+    parser.add_argument("--data-types", nargs="+", default=list(DATA_TYPES), choices=DATA_TYPES)
+    parser.add_argument("--notice", default="tree", choices=["tree", "branch", "object"])
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("EU_CELEX_CONCURRENCY", 8)))
+    parser.add_argument("--rate", type=float, default=float(os.getenv("EU_CELEX_RATE", 10)), help="requests/sec")
+    parser.add_argument("--base-url", default=os.getenv("EU_CELEX_BASE_URL", CELEX_BASE_URL),
+                        help="CELEX resource endpoint, e.g. the stand-in started by celex_fixture_server.py")
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    celex_numbers = read_celex_numbers(args.csv)[:args.limit]
+    print(bulk_download(celex_numbers, args.output, args.data_types, args.notice, args.concurrency,
+                        args.rate, args.base_url))
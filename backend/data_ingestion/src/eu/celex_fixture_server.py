@@ -0,0 +1,113 @@
+import os
+import sys
+import json
+import tempfile
+import argparse
+import threading
+import subprocess
+from functools import partial
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import unquote
+
+import pandas as pd
+
+FIXTURE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "raw", "eu", "celex-sample"))
+CELEX_PATH = "/resource/celex/"
+
+
+class CelexFixtureHandler(BaseHTTPRequestHandler):
+    """Answers Eurlex.get_data requests from fixture files, standing in for the CELEX resource endpoint.
+
+    `<fixture_dir>/<celex>/` holds object.xml (title), identifiers.xml (ids),
+    tree.xml / branch.xml (notices) and text.html (text). A missing file is
+    answered like Cellar does: 406 for text without an acceptable manifestation,
+    404 otherwise.
+    """
+
+    def __init__(self, *args, fixture_dir=FIXTURE_DIR, **kwargs):
+        self.fixture_dir = fixture_dir
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        if not self.path.startswith(CELEX_PATH):
+            return self.send_error(404)
+        celex = unquote(self.path[len(CELEX_PATH):])
+        accept = self.headers.get("Accept", "")
+        if "notice=" in accept:
+            notice = accept.split("notice=")[1].split(",")[0].strip()
+            name, content_type, missing = f"{notice}.xml", "application/xml", 404
+        else:
+            name, content_type, missing = "text.html", "text/html; charset=UTF-8", 406
+        if not os.path.isdir(os.path.join(self.fixture_dir, celex)):
+            return self.send_error(404)
+        path = os.path.join(self.fixture_dir, celex, name)
+        if not os.path.isfile(path):
+            return self.send_error(missing)
+        with open(path, "rb") as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(fixture_dir=FIXTURE_DIR, port=0):
+    """Start the stand-in server on a background thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), partial(CelexFixtureHandler, fixture_dir=fixture_dir))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}{CELEX_PATH}"
+
+
+def check(fixture_dir=FIXTURE_DIR):
+    """Run the celex_download CLI against the fixtures and compare it with the expected column of celex.csv.
+
+    Returns a list of mismatches (empty when every row succeeded or failed as expected).
+    """
+    expected = pd.read_csv(os.path.join(fixture_dir, "celex.csv"), dtype=str, keep_default_na=False)
+    server, base_url = serve(fixture_dir)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "celex.jsonl")
+            subprocess.run(
+                [sys.executable, os.path.join(os.path.dirname(__file__), "celex_download.py"),
+                 os.path.join(fixture_dir, "celex.csv"), output, "--base-url", base_url, "--rate", "0"],
+                check=True,
+            )
+            with open(output, encoding="utf-8") as f:
+                done = {json.loads(line)["celex"] for line in f}
+            with open(f"{output}.failed", encoding="utf-8") as f:
+                failed = {record["celex"]: record["error"] for record in map(json.loads, f)}
+    finally:
+        server.shutdown()
+
+    mismatches = []
+    for row in expected.itertuples():
+        outcome = "done" if row.celex in done else "failed" if row.celex in failed else "missing"
+        if outcome != row.expected:
+            mismatches.append(f"{row.celex}: expected {row.expected}, got {outcome} {failed.get(row.celex, '')}")
+        elif outcome == "failed" and failed[row.celex] != f"RuntimeError: {row.reason}":
+            mismatches.append(f"{row.celex}: expected {row.reason!r}, got {failed[row.celex]!r}")
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve CELEX fixtures for celex_download.py --base-url.")
+    parser.add_argument("--fixtures", default=FIXTURE_DIR)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--check", action="store_true", help="run celex_download.py against the fixtures and exit")
+    args = parser.parse_args()
+
+    if args.check:
+        mismatches = check(args.fixtures)
+        print("\n".join(mismatches) or "All CELEX fixture rows downloaded or failed as expected")
+        sys.exit(1 if mismatches else 0)
+    server, base_url = serve(args.fixtures, args.port)
+    print(f"Serving {args.fixtures} at {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
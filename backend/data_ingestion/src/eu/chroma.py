@@ -1,15 +1,24 @@
 from multiprocessing import Pool, current_process
 import os
 import json
+import time
 import pandas as pd
 import logging
 import traceback
+import threading
+import chromadb
 from dotenv import load_dotenv
-import boto3
 from bs4 import BeautifulSoup
 import hashlib
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_huggingface import HuggingFaceEmbeddings
+from common.embedding_cache import EmbeddingCache, CachedEmbeddings
+from common.ids import make_id
+from eu.metadata_index import load_metadata_index, ensure_metadata_index
+from common.prefetch import prefetch
+from common.object_store import open_object_store
+from common.ingestion_manifest import IngestionManifest
+from common.scheduler import run_parallel
 
 def extract_mt_code(mt):
     if pd.isna(mt):
@@ -28,39 +37,117 @@ def decompose_celex(celex):
     year = celex[1:5]
     return sector, year
 
-def make_id(doc_path):
-    return hashlib.md5(doc_path[32:].encode("utf-8")).hexdigest()[:12]
+def flush_chunks(collection, embeddings, pending, batch_size):
+    """Embed and store the accumulated chunks in batches of `batch_size`, then empty the buffer."""
+    stored = 0
+    for start in range(0, len(pending["documents"]), batch_size):
+        texts = pending["documents"][start:start + batch_size]
+        # upsert, so documents stored before a crash but not yet in the manifest can be redone
+        collection.upsert(
+            documents=texts,
+            metadatas=pending["metadatas"][start:start + batch_size],
+            embeddings=embeddings.embed_documents(texts),
+            ids=pending["ids"][start:start + batch_size]
+        )
+        stored += len(texts)
+    if pending["stale_ids"]:
+        # Chunks of re-embedded documents beyond their new chunk count
+        collection.delete(ids=pending["stale_ids"])
+    for values in pending.values():
+        values.clear()
+    return stored
 
-def process_documents_batch(documents, collection):
+def store_pending(pid, idx, collection, embeddings, manifest, pending, batch_size, failed):
+    """flush_chunks(), then record the batch's documents as done (or failed) in the manifest."""
+    docs = list(pending["docs"])
+    try:
+        stored = flush_chunks(collection, embeddings, pending, batch_size)
+    except Exception as e:
+        logging.error("[%d] %s | Error storing chunks of %s:\n%s", pid, idx, ", ".join(d[0] for d in docs), traceback.format_exc())
+        print(f"[{pid}] {idx} | Error storing chunks of {len(docs)} documents | {e}")
+        manifest.mark_failed([(doc_path, content_hash, str(e)) for doc_path, content_hash, _ in docs])
+        failed.extend(doc_path for doc_path, _, _ in docs)
+        for values in pending.values():
+            values.clear()
+        return 0
+    manifest.mark_done(docs)
+    return stored
+
+# Per-process resources, built on the first batch a worker runs and reused for later ones.
+# Batches may also run on threads of one process, which then share (and must not race to build) them.
+worker_resources = {}
+worker_resources_lock = threading.Lock()
+
+def get_worker_resources(chroma_path, collection_name):
     pid = current_process().pid
+    key = (pid, chroma_path, collection_name)
+    with worker_resources_lock:
+        if key not in worker_resources:
+            worker_resources[key] = build_worker_resources(pid, chroma_path, collection_name)
+        return worker_resources[key]
+
+def build_worker_resources(pid, chroma_path, collection_name):
     logging.basicConfig(
         filename=f'log/{pid}.log',          # file to write logs
         level=logging.ERROR,            # log only errors and above
         format="%(asctime)s - %(levelname)s - %(message)s"
     )
 
-    AWS_ACCESS_KEY_ID = os.getenv("S3_ACCESS_KEY_ID")
-    AWS_SECRET_ACCESS_KEY = os.getenv("S3_SECRET_ACCESS_KEY")
-    bucket_name = 'regguru'
-    # Create an S3 client
-    s3 = boto3.client(
-        's3',
-        aws_access_key_id=AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=AWS_SECRET_ACCESS_KEY
-    )
+    # Objects fetched ahead of the parser; the store is shared by the fetch threads
+    prefetch_size = int(os.getenv("EU_PREFETCH_OBJECTS", "16"))
+    # S3 bucket or local copy of it, see open_object_store()
+    store = open_object_store(max_pool_connections=prefetch_size)
 
+    # (work-id, doc) -> EuroVoc terms, MT codes and CELEX, precomputed once and stored as Parquet
     la_mtd_file = os.getenv("EU_LEGAL_ACT_METADATA_FILE")
-    la_mtd = pd.read_csv(la_mtd_file)
-    la_mtd["MT-code"] = la_mtd["MT"].apply(extract_mt_code)
-    la_mtd["MT-term"] = la_mtd["MT"].apply(extract_mt_term)
-    la_mtd['doc-path'] = "eu/LEG_EN_HTML_20250721_04_08/" + la_mtd['work-id'] + "/" + la_mtd['format'] + "/" + la_mtd['doc']
-    la_mtd['mtd-path'] = "eu/LEG_MTD_20250709_22_36/" + la_mtd['work-id'] + "/tree_non_inferred.rdf"
+    metadata_index = load_metadata_index(la_mtd_file, os.getenv("EU_LEGAL_ACT_METADATA_INDEX"))
 
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=1000,  # Slightly larger chunks
         chunk_overlap=200
     )
 
+    # Chunks embedded by a previous run are served from the on-disk cache
+    embedding_cache = EmbeddingCache(os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3"))
+    embeddings = CachedEmbeddings(
+        HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2", model_kwargs={"device": "cpu"}),
+        embedding_cache,
+        model_name="all-MiniLM-L6-v2"
+    )
+
+    manifest = IngestionManifest(os.getenv("EU_INGESTION_MANIFEST", "ingestion_manifest.sqlite3"))
+
+    # Each process opens its own client; a live collection cannot be shared with worker processes
+    collection = chromadb.PersistentClient(path=chroma_path).get_or_create_collection(name=collection_name)
+    return (prefetch_size, store, metadata_index, text_splitter, embeddings, manifest, collection)
+
+def process_documents_batch(documents, chroma_path, collection_name):
+    pid = current_process().pid
+    prefetch_size, store, metadata_index, text_splitter, embeddings, manifest, collection = \
+        get_worker_resources(chroma_path, collection_name)
+    hits, misses = embeddings.hits, embeddings.misses
+    failed = []
+
+    def fetch(item):
+        idx, row = item
+        return store.get(row["doc-path"])
+
+    # Documents completed by an earlier run are skipped; failed ones are retried.
+    # With EU_INGESTION_VERIFY_SOURCE=1 completed documents are fetched again and
+    # only re-embedded if their content hash changed.
+    verify_source = os.getenv("EU_INGESTION_VERIFY_SOURCE", "0") == "1"
+    previous = manifest.get_many(documents["doc-path"].tolist())
+    if not verify_source:
+        completed = [doc_path for doc_path, record in previous.items() if record["status"] == "done"]
+        documents = documents[~documents["doc-path"].isin(completed)]
+        print(f"[{pid}] skipping {len(completed)} documents completed by a previous run")
+
+    # Chunks of consecutive documents are embedded and stored together
+    batch_size = int(os.getenv("EU_EMBEDDING_BATCH_SIZE", "512"))
+    pending = {"documents": [], "metadatas": [], "ids": [], "docs": [], "stale_ids": []}
+    chunks_stored = 0
+    started = time.perf_counter()
+
     batch_idx = 0
 
     # for idx, row in documents.iterrows():
@@ -107,16 +194,23 @@ def process_documents_batch(documents, collection):
     #     if (idx + 1) % 100 == 0:
     #         print(f"[{pid}] processed batch {batch_idx}")
     #         batch_idx += 1
-    for idx, row in documents.iterrows():
+    for (idx, row), body, fetch_error in prefetch(documents.iterrows(), fetch, max_in_flight=prefetch_size):
         try:
-            # Load document from S3
-            obj = s3.get_object(Bucket=bucket_name, Key=row["doc-path"])
-            html_content = obj['Body'].read().decode('utf-8')  # HTML as string
+            # Documents are read from the object store in the background
+            if fetch_error:
+                raise fetch_error
+            content_hash = hashlib.md5(body).hexdigest()
+            record = previous.get(row["doc-path"])
+            if record and record["status"] == "done" and record["content_hash"] == content_hash:
+                continue  # unchanged since it was stored
+            html_content = body.decode('utf-8')  # HTML as string
             soup = BeautifulSoup(html_content, 'html.parser')
             text = soup.get_text(separator="\n")  # plain text
         except Exception as e:
-            logging.error("[%d] %d | Error fetching %s from S3:\n%s", pid, idx, row["doc-path"], traceback.format_exc())
+            logging.error("[%d] %d | Error fetching %s:\n%s", pid, idx, row["doc-path"], traceback.format_exc())
             print(f"[{pid}] {idx} | Error fetching {row['doc-path']}")
+            manifest.mark_failed([(row["doc-path"], None, str(e))])
+            failed.append(row["doc-path"])
             continue
         
         meta = {}      
@@ -127,14 +221,13 @@ def process_documents_batch(documents, collection):
             for m in soup.find_all("meta"):
                 if m.get("name") and m.get("content"):
                     meta[m["name"].lower()] = m["content"]
-            meta_download = la_mtd[(la_mtd["work-id"] == row["work-id"]) & (la_mtd["doc"] == row["doc"])]
-            terms = meta_download["TERMS (PT-NPT)"].dropna().astype(str).unique()
-            meta['eurovoc-terms'] = ';'.join(terms)
-            mts = meta_download["MT"].dropna().astype(str).unique()
-            meta['eurovoc-mt'] = ';'.join(mts)
-
-            sector, year = decompose_celex(row['celex']) if row['celex'] else (None, None)
-            meta['celex'] = row['celex'] if row['celex'] else None
+            meta_download = metadata_index.get((row["work-id"], row["doc"]), {})
+            meta['eurovoc-terms'] = meta_download.get("eurovoc-terms", "")
+            meta['eurovoc-mt'] = meta_download.get("eurovoc-mt", "")
+
+            celex = row['celex'] if row['celex'] else meta_download.get("celex")
+            sector, year = decompose_celex(celex) if celex else (None, None)
+            meta['celex'] = celex if celex else None
             meta['celex-sector'] = sector # a character
             meta['celex-year'] = int(year) # a 4-digit number
         except Exception as e:
@@ -143,23 +236,60 @@ def process_documents_batch(documents, collection):
             
         
         try:
-            # Split, embed, and store
-            chunks = text_splitter.split_text(text)
-            texts = [chunk for chunk in chunks]
-            embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2", model_kwargs={"device": "cpu"})
-            collection.add(
-                documents=texts,
-                metadatas=[meta for _ in range(len(texts))],
-                embeddings=embeddings.embed_documents(texts),
-                ids=[f"{make_id(row['doc-path'])}_{i}" for i in range(len(texts))]
-            )
+            # Split, then queue the chunks for the next embedding batch
+            texts = text_splitter.split_text(text)
+            pending["documents"].extend(texts)
+            pending["metadatas"].extend(meta for _ in range(len(texts)))
+            pending["ids"].extend(f"{make_id(row['doc-path'])}_{i}" for i in range(len(texts)))
+            pending["docs"].append((row["doc-path"], content_hash, len(texts)))
+            # Source changed since it was stored: the new chunks overwrite the old ones by id,
+            # and old chunks beyond the new count are deleted once the new ones are stored
+            if record and record["status"] == "done":
+                pending["stale_ids"].extend(
+                    f"{make_id(row['doc-path'])}_{i}" for i in range(len(texts), record["chunks"] or 0)
+                )
         except Exception as e:
             logging.error("[%d] %d | Error processing %s:\n%s", pid, idx, row["doc-path"], traceback.format_exc())
             print(f"[{pid}] {idx} | Error processing {row['doc-path']} | {e}")
+            manifest.mark_failed([(row["doc-path"], content_hash, str(e))])
+            failed.append(row["doc-path"])
             continue
 
+        if len(pending["documents"]) >= batch_size:
+            chunks_stored += store_pending(pid, idx, collection, embeddings, manifest, pending, batch_size, failed)
+            elapsed = time.perf_counter() - started
+            print(f"[{pid}] {chunks_stored} chunks stored ({chunks_stored / elapsed:.1f} chunks/sec)")
+
         if (idx + 1) % 100 == 0:
             print(f"[{pid}] processed batch {batch_idx}")
             batch_idx += 1
-        
-        return True
+
+    chunks_stored += store_pending(pid, "end", collection, embeddings, manifest, pending, batch_size, failed)
+    elapsed = time.perf_counter() - started
+    print(
+        f"[{pid}] done: {chunks_stored} chunks in {elapsed:.1f}s "
+        f"({chunks_stored / elapsed if elapsed else 0:.1f} chunks/sec, "
+        f"embedding cache hits {embeddings.hits - hits}, misses {embeddings.misses - misses})"
+    )
+    return {"documents": len(documents), "chunks": chunks_stored, "failed": failed}
+
+def run_chroma_ingestion(documents, chroma_path, collection_name, num_processes=4, unit_size=100):
+    """Embed documents into the Chroma collection `collection_name` at `chroma_path` with dynamically scheduled work units.
+
+    Workers open the collection themselves. Returns totals over all units, with
+    failed documents and failed units collected here.
+    """
+    # Build a missing or stale metadata index once here, so the workers only load it
+    ensure_metadata_index(os.getenv("EU_LEGAL_ACT_METADATA_FILE"), os.getenv("EU_LEGAL_ACT_METADATA_INDEX"))
+    totals = {"chunks": 0, "failed": []}
+
+    def on_result(result):
+        totals["chunks"] += result["chunks"]
+        totals["failed"].extend(result["failed"])
+
+    report = run_parallel(process_documents_batch, documents, chroma_path, collection_name,
+                          num_processes=num_processes, unit_size=unit_size, on_result=on_result)
+    chunks, failed = totals["chunks"], totals["failed"]
+    print(f"Stored {chunks} chunks ({chunks / report['seconds'] if report['seconds'] else 0:.1f} chunks/sec), "
+          f"{len(failed)} failed documents, {len(report['errors'])} failed units")
+    return {"chunks": chunks, "failed": failed, "failed_units": report["errors"]}
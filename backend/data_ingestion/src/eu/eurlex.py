@@ -7,6 +7,8 @@ from io import BytesIO
 
 import requests
 import sparql_dataframe
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 try:
     from typing import Literal, get_args
@@ -20,6 +22,36 @@ from halo import Halo
 from pdfminer.high_level import extract_text
 
 
+# Statuses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def make_session(pool_size=16, max_retries=5, backoff_factor=0.5):
+    """Creates a requests session with a keep-alive connection pool and exponential backoff on 429/5xx.
+    Parameters
+    ----------
+    pool_size: int
+        Number of connections kept open per host, i.e. the number of requests that can run concurrently without reconnecting
+    max_retries: int
+        Number of retries for connection errors and retryable statuses
+    backoff_factor: float
+        Retries wait backoff_factor * 2 ** (retry - 1) seconds, or what the Retry-After header asks for
+    """
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=["HEAD", "GET"],
+        respect_retry_after_header=True,
+        raise_on_status=False,  # return the last response, callers check status_code
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
 class Eurlex:
     """The sole class of the pyeurlex module."""
 
@@ -27,9 +59,17 @@ class Eurlex:
         self,
         endpoint="http://publications.europa.eu/webapi/rdf/sparql",
         sparql_query="",
+        pool_size=16,
+        timeout=(10, 60),
+        max_retries=5,
+        backoff_factor=0.5,
     ):
         self.endpoint = endpoint
         self.sparql_query = sparql_query
+        # All requests share one pooled session, so bulk downloads reuse connections instead of a TCP/TLS handshake per call
+        self.session = make_session(pool_size, max_retries, backoff_factor)
+        # (connect, read) timeout in seconds for every request
+        self.timeout = timeout
         # self.document_type = document_type
         # self.output_dir = output_dir
 
@@ -533,8 +573,11 @@ class Eurlex:
         filename: str = None,
         languages: list = ["en", "fr", "de"],
         mode: str = "wb",
+        returns: str = "content",
+        chunk_size: int = 1024 * 1024,
     ):
         """Downloads the XML notice for a given notice type, when supplied with a URL or CELEX number.
+        The notice is fetched with a single GET that follows the redirect to Cellar, and streamed to the file in chunks.
         Parameters
         ----------
         url: str
@@ -551,10 +594,17 @@ class Eurlex:
         mode: str
             The mode to open the file in.
         Default: "wb"
+        returns: str
+            What to return: "content" (the notice as str, as before), "file" (the saved file opened for reading, which the caller closes) or "none".
+            Only "content" reads the notice into memory, so use "none" or "file" for big tree notices.
+        Default: "content"
+        chunk_size: int
+            Number of bytes written to the file at a time.
+        Default: 1048576
 
         Returns
         -------
-        None
+        str, file object or None, depending on returns
 
         Examples
         --------
@@ -564,10 +614,12 @@ class Eurlex:
         >>> eur.download_xml("32016R0679", notice="object", filename="test.xml")
         >>> eur.download_xml("32014R0001", notice="tree")
         >>> eur.download_xml("32014R0001", notice="branch")
+        >>> eur.download_xml("32014R0001", notice="tree", returns="none")
         """
         assert url, "URL has to be specified"
-        filename = os.path.basename(url)
+        filename = filename or os.path.basename(url)
         assert notice, "Notice type has to be specified"
+        assert returns in ("content", "file", "none"), "returns must be one of content, file or none"
         assert (
             notice in self.notice_type
         ), "Notice type must be set as one of {}".format(self.notice_type)
@@ -598,27 +650,31 @@ class Eurlex:
             print("The CELEX url is: {}".format(url))
         accept_header = "application/xml; notice=" + notice
         if notice == "object":
-            head = requests.head(
-                # redirects to cellar url so redirects are necessary
-                url,
-                headers={"Accept": accept_header},
-                allow_redirects=True,
-            )
+            headers = {"Accept": accept_header}
         else:
-            head = requests.head(
-                url,
-                headers={"Accept-Language": language_header, "Accept": accept_header},
-                allow_redirects=True,
-            )
-        assert head.status_code == 200, "The http request was unsuccessful {}".format(
-            head.status_code
-        )
-        file_content = requests.get(head.url).content
-        with open(filename, mode) as writer:
-            writer.write(file_content)
-        return str(
-            file_content
-        )  # TODO alternatively, offer to return instead of saving to file (or make separate function)
+            headers = {"Accept-Language": language_header, "Accept": accept_header}
+        # redirects to cellar url so redirects are necessary; the body is only read while writing it out
+        with self.session.get(
+            url,
+            headers=headers,
+            allow_redirects=True,
+            stream=True,
+            timeout=self.timeout,
+        ) as response:
+            assert (
+                response.status_code == 200
+            ), "The http request was unsuccessful {}".format(response.status_code)
+            content = []
+            with open(filename, mode) as writer:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    writer.write(chunk)
+                    if returns == "content":
+                        content.append(chunk)
+        if returns == "file":
+            return open(filename, "rb")
+        if returns == "content":
+            return str(b"".join(content))
+        return None
 
     data_types: Literal = ["title", "text", "ids", "notice"]
 
@@ -708,12 +764,13 @@ class Eurlex:
             try:
                 if __name__ == "__main__":
                     print("Getting title data...")
-                response = requests.get(
+                response = self.session.get(
                     url,
                     headers={
                         "Accept-Language": language_header,
                         "Accept": "application/xml; notice=object",
                     },
+                    timeout=self.timeout,
                 )
             except Exception as e:
                 print("There was an error during data retrieval: {}", e)
@@ -766,13 +823,14 @@ class Eurlex:
             try:
                 if __name__ == "__main__":
                     print("Getting text data...")
-                response = requests.get(
+                response = self.session.get(
                     url,
                     headers={
                         "Accept-Language": language_header,
                         "Content-Language": language_header,
                         "Accept": "text/html, text/html;type=simplified, text/plain, application/xhtml+xml, application/xhtml+xml;type=simplified, application/pdf, application/pdf;type=pdf1x, application/pdf;type=pdfa1a, application/pdf;type=pdfx, application/pdf;type=pdfa1b, application/msword",
                     },
+                    timeout=self.timeout,
                 )
             except Exception as e:
                 print("There was an error during gathering data: {}", e)
@@ -792,13 +850,14 @@ class Eurlex:
                     print("Found multiple links: {}", links)
                 multiout = ""
                 for link in links:
-                    multiresponse = requests.get(
+                    multiresponse = self.session.get(
                         url,
                         headers={
                             "Accept-Language": language_header,
                             "Content-Language": language_header,
                             "Accept": "text/html, text/html;type=simplified, text/plain, application/xhtml+xml, application/xhtml+xml;type=simplified, application/pdf, application/pdf;type=pdf1x, application/pdf;type=pdfa1a, application/pdf;type=pdfx, application/pdf;type=pdfa1b, application/msword",
                         },
+                        timeout=self.timeout,
                     )
                     if multiresponse.status_code == 200:
                         if __name__ == "__main__":
@@ -828,12 +887,13 @@ class Eurlex:
 
         elif data_type == "ids":
             out = ""
-            response = requests.get(
+            response = self.session.get(
                 url,
                 headers={
                     "Accept-Language": language_header,
                     "Accept": "application/xml; notice=identifiers",
                 },
+                timeout=self.timeout,
             )
             if response.status_code == 200:
                 xml = BeautifulSoup(response.content, "xml")
@@ -852,14 +912,15 @@ class Eurlex:
             if (
                 notice == "object"
             ):  # if notice is of type object, there is no language header
-                response = requests.get(url, headers={"Accept": accept_header})
+                response = self.session.get(url, headers={"Accept": accept_header}, timeout=self.timeout)
             else:
-                response = requests.get(
+                response = self.session.get(
                     url,
                     headers={
                         "Accept-Language": language_header,
                         "Accept": accept_header,
                     },
+                    timeout=self.timeout,
                 )
             if response.status_code == 200:
                 if __name__ == "__main__":
@@ -959,7 +1020,7 @@ class Eurlex:
         multiple_lists = {}
         for u in urls:
             # response = requests.get(u)
-            response = requests.get(u)
+            response = self.session.get(u, timeout=self.timeout)
             soup = BeautifulSoup(response.text, "html.parser")
             table = soup.find("table").findAll(
                 "tr",
@@ -1001,7 +1062,7 @@ class Eurlex:
                         except:
                             pass
                         try:
-                            curia_docs = requests.get(records[index]["link"])
+                            curia_docs = self.session.get(records[index]["link"], timeout=self.timeout)
                         except:
                             if __name__ == "__main__":
                                 print(
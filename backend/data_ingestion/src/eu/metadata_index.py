@@ -0,0 +1,55 @@
+import os
+import pandas as pd
+
+KEY_COLUMNS = ["work-id", "doc"]
+
+
+def unique_join(values):
+    return ';'.join(values.dropna().astype(str).unique())
+
+
+def build_metadata_index(la_mtd_file, index_path):
+    """Collapse the legal act metadata (CSV or Parquet) to one row per (work-id, doc) and save it as Parquet.
+
+    The CSV has one row per EuroVoc term, so the terms and MT codes of a document
+    are joined here once instead of being filtered out of the full table per document.
+    """
+    columns = KEY_COLUMNS + ["celex", "TERMS (PT-NPT)", "MT"]
+    if la_mtd_file.endswith(".parquet"):
+        la_mtd = pd.read_parquet(la_mtd_file, columns=columns)
+    else:
+        la_mtd = pd.read_csv(la_mtd_file, usecols=columns)
+    index = la_mtd.groupby(KEY_COLUMNS, sort=False).agg(**{
+        "eurovoc-terms": ("TERMS (PT-NPT)", unique_join),
+        "eurovoc-mt": ("MT", unique_join),
+        "celex": ("celex", "first"),
+    }).reset_index()
+
+    # Write to a temporary file first, so readers never see a partial index
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    index.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, index_path)
+    return index
+
+
+def ensure_metadata_index(la_mtd_file, index_path=None):
+    """(Re)build the Parquet index if it is missing or older than the CSV, and return its path.
+
+    Call this once before starting worker processes, so they only load the index.
+    """
+    index_path = index_path or f"{os.path.splitext(la_mtd_file)[0]}.index.parquet"
+    if not os.path.exists(index_path) or os.path.getmtime(index_path) < os.path.getmtime(la_mtd_file):
+        build_metadata_index(la_mtd_file, index_path)
+    return index_path
+
+
+def load_metadata_index(la_mtd_file, index_path=None):
+    """Return {(work-id, doc): {"eurovoc-terms", "eurovoc-mt", "celex"}}, building the index if needed."""
+    index = pd.read_parquet(ensure_metadata_index(la_mtd_file, index_path))
+    index = index.astype(object).where(index.notna(), None)
+    return {
+        (work_id, doc): {"eurovoc-terms": terms, "eurovoc-mt": mts, "celex": celex}
+        for work_id, doc, terms, mts, celex in zip(
+            index["work-id"], index["doc"], index["eurovoc-terms"], index["eurovoc-mt"], index["celex"]
+        )
+    }
@@ -0,0 +1,128 @@
+import os
+import threading
+from bs4 import BeautifulSoup
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from common.pipeline_base import IngestionPipeline, register_pipeline
+from common.object_store import LocalObjectStore, open_object_store
+from common.ids import make_id
+
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SAMPLE_DIR = os.path.join(DATA_DIR, "raw", "eu", "eurlex-sample")
+HTML_PREFIX = "eu/LEG_EN_HTML_20250721_04_08/"
+
+
+@register_pipeline
+class EUPipeline(IngestionPipeline):
+    """EU legal acts: HTML documents from the object store, embedded into a local Chroma collection."""
+
+    region = "eu"
+    stage_workers = {"process": 4, "embed": 1}
+
+    cache_dir = os.getenv("EU_PIPELINE_CACHE_DIR", os.path.join(DATA_DIR, "processed", "eu", "stage-cache"))
+
+    def __init__(self, store=None, prefix=HTML_PREFIX, collection_name="eu-legal-acts",
+                 chroma_path=os.path.join(DATA_DIR, "chroma", "eu"), batch_size=512,
+                 chunk_size=1000, chunk_overlap=200, model_name=os.getenv("EU_EMBEDDING_MODEL", "all-MiniLM-L6-v2"),
+                 embeddings=None):
+        # Without EU_OBJECT_STORE the bundled sample documents are used. The HuggingFace model is
+        # still downloaded on first use: for a fully offline run it must be cached (or EU_EMBEDDING_MODEL
+        # point at a local copy), or `embeddings` must be given to use instead of it
+        self.store = store or (open_object_store() if os.getenv("EU_OBJECT_STORE") else LocalObjectStore(SAMPLE_DIR))
+        self.prefix = prefix
+        self.collection_name = collection_name
+        self.chroma_path = chroma_path
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.model_name = model_name
+        self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self._collection = None
+        self.embeddings = embeddings
+        self._embeddings = embeddings
+        self._lock = threading.Lock()
+
+    def ingest(self):
+        return list(self.iter_ingest())
+
+    def iter_ingest(self):
+        for keys in self.store.list(self.prefix):
+            yield from (key for key in keys if key.endswith(".html"))
+
+    def item_fingerprint(self, raw_item):
+        # Keys are references; their version changes when the object does, without downloading it
+        return f"{raw_item}:{self.store.version(raw_item)}"
+
+    def stage_config(self, stage):
+        if stage == "process":
+            return {"chunk_size": self.chunk_size, "chunk_overlap": self.chunk_overlap}
+        if stage == "embed":
+            config = {"model": self.model_name, "chroma_path": self.chroma_path, "collection": self.collection_name}
+            if self.embeddings is not None:
+                config["embeddings"] = type(self.embeddings).__name__
+            return config
+        return {}
+
+    def process(self, raw_data):
+        return [doc for key in raw_data for doc in self.process_item(key)]
+
+    def process_item(self, raw_item):
+        soup = BeautifulSoup(self.store.get(raw_item).decode("utf-8"), "html.parser")
+        texts = self.text_splitter.split_text(soup.get_text(separator="\n"))
+        # The chunk count lets embed() delete the chunks of a longer previous version
+        meta = {"doc-path": raw_item, "title": str(soup.title.string) if soup.title and soup.title.string else "",
+                "chunks": len(texts)}
+        return [{"id": f"{make_id(raw_item)}_{i}", "text": text, "metadata": meta} for i, text in enumerate(texts)]
+
+    def _open_collection(self):
+        # Created on first use so constructing the pipeline stays cheap
+        with self._lock:
+            if self._collection is None:
+                import chromadb
+                client = chromadb.PersistentClient(path=self.chroma_path)
+                self._collection = client.get_or_create_collection(name=self.collection_name)
+            return self._collection
+
+    def embed_target_state(self):
+        # A deleted or recreated collection gets a new id, so its docs are embedded again
+        return str(self._open_collection().id)
+
+    def _target(self):
+        collection = self._open_collection()
+        with self._lock:
+            if self._embeddings is None:
+                from langchain_huggingface import HuggingFaceEmbeddings
+                from common.embedding_cache import EmbeddingCache, CachedEmbeddings
+                self._embeddings = CachedEmbeddings(
+                    HuggingFaceEmbeddings(model_name=self.model_name, model_kwargs={"device": "cpu"}),
+                    EmbeddingCache(os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3")),
+                    model_name=self.model_name
+                )
+            return collection, self._embeddings
+
+    def _delete_stale_chunks(self, collection, docs):
+        """Delete stored chunks of the docs' paths beyond their current chunk count.
+
+        Re-embedded chunks overwrite the previous ones by id, but a doc that now
+        splits into fewer chunks would otherwise keep its old higher-index ones.
+        """
+        counts = {doc["metadata"]["doc-path"]: doc["metadata"]["chunks"] for doc in docs}
+        for path, count in counts.items():
+            current = {f"{make_id(path)}_{i}" for i in range(count)}
+            stored = collection.get(where={"doc-path": path}, include=[])["ids"]
+            stale = [id for id in stored if id not in current]
+            if stale:
+                collection.delete(ids=stale)
+
+    def embed(self, docs):
+        collection, embeddings = self._target()
+        self._delete_stale_chunks(collection, docs)
+        for start in range(0, len(docs), self.batch_size):
+            batch = docs[start:start + self.batch_size]
+            texts = [doc["text"] for doc in batch]
+            collection.upsert(
+                ids=[doc["id"] for doc in batch],
+                documents=texts,
+                metadatas=[doc["metadata"] for doc in batch],
+                embeddings=embeddings.embed_documents(texts)
+            )
+        return [doc["id"] for doc in docs]
@@ -1,17 +1,32 @@
 from multiprocessing import Pool, current_process
 import os
 import json
+import glob
+import time
+import uuid
 import rdflib
+import pandas as pd
 from rdflib import Namespace
 from rdflib.namespace import OWL, SKOS, RDFS
 from dotenv import load_dotenv
+from eu.rdf_stream import extract_work_streaming, UnsupportedRDF
+from common.scheduler import run_parallel
 
 load_dotenv(override=True)
 metadata_folder = os.getenv("EU_METADATA_PATH")
 work_metadata_mapping = os.getenv("EU_WORK_METADATA_MAPPING_PATH")
 work_eurovoc_mapping = os.getenv("EU_WORK_EUROVOC_MAPPING_PATH")
 work_celex_mapping = os.getenv("EU_WORK_CELEX_MAPPING_PATH")
+# Read notices with the streaming extractor, falling back to rdflib for unusual files
+use_streaming = os.getenv("EU_RDF_STREAMING", "1") == "1"
+# Records (or approximate bytes of values) buffered per mapping before a Parquet part file is written
+part_records = int(os.getenv("EU_MAPPING_PART_RECORDS", "50000"))
+part_bytes = int(os.getenv("EU_MAPPING_PART_BYTES", str(64 * 1024 * 1024)))
 CDM = Namespace("http://publications.europa.eu/ontology/cdm#")
+ENTRY_INTO_FORCE = rdflib.URIRef("http://publications.europa.eu/ontology/cdm#date_entry-into-force")
+
+def as_str(value):
+    return str(value) if value is not None else None
 
 def get_pref_label(obj, g):
     name = None
@@ -29,213 +44,250 @@ def get_pref_label(obj, g):
     else:
         return name
 
-def process_metadata_batch(rows):
+def parse_work(mtd_path):
+    g = rdflib.Graph()
+    g.parse(mtd_path, format="xml")
+    return g
+
+def extract_work(g, row):
+    """Extract everything the metadata, eurovoc and celex mappings need from one parsed work."""
+    # Eurovoc codes
+    eurovoc_code = [str(obj).split("/")[-1] for obj in g.objects(None, CDM.work_is_about_concept_eurovoc)]
+
+    # Celex number (get first match)
+    celex_number = next(g.objects(None, CDM.resource_legal_id_celex), None)
+    if not celex_number:
+        celex_number = next(g.objects(None, CDM.celex_number), None)
+
+    # If has celex number, get cellar uri, cellar man id, and cellar cs id (item identifier)
+    cellar_uri = None
+    if celex_number and all(key in row for key in ("celex-expr-id", "celex-man-id", "celex-cs-id")):
+        celex_uri = rdflib.URIRef(f"http://publications.europa.eu/resource/celex/{celex_number}.{row['celex-expr-id']}.{row['celex-man-id']}.{row['celex-cs-id']}")
+        cellar_uri = next(g.subjects(predicate=OWL.sameAs, object=celex_uri), None)
+
+    return {
+        "celex-number": str(celex_number) if celex_number else celex_number,
+        "cellar-uri": str(cellar_uri) if cellar_uri else cellar_uri,
+        "eurovoc-codes": eurovoc_code,
+        "date-publication": as_str(next(g.objects(None, CDM.work_date_publication), None)),
+        "date-entry-into-force": as_str(next(g.objects(None, ENTRY_INTO_FORCE), None)),
+        "date-expiration": as_str(next(g.objects(None, CDM.date_expiration), None)),
+        "created-agent": as_str(next((get_pref_label(obj, g) for obj in g.objects(None, CDM.work_created_by_agent)), None)),
+        "authored-agent": as_str(next((get_pref_label(obj, g) for obj in g.objects(None, CDM.work_authored_by_agent)), None)),
+        "contributed-agent": as_str(next((get_pref_label(obj, g) for obj in g.objects(None, CDM.work_contributed_to_by_agent)), None))
+    }
+
+def read_work(mtd_path, row):
+    if use_streaming:
+        try:
+            return extract_work_streaming(mtd_path, row)
+        except UnsupportedRDF:
+            pass
+    return extract_work(parse_work(mtd_path), row)
+
+def save_batch(folder, pid, batch_idx, records, final=False, run_id=None):
+    """Write records as a Parquet part file; repeated codes are stored dictionary-encoded.
+
+    Parts are named {pid}_{run_id}_{batch_idx}.parquet, so runs in the same
+    process (or a later process with a reused pid) do not overwrite each other.
+    """
+    df = pd.DataFrame.from_records(records)
+    if "eurovoc-code" in df:
+        df["eurovoc-code"] = df["eurovoc-code"].astype("category")
+    run_id = run_id or new_run_id()
+    outfile = os.path.join(folder, f"{pid}_{run_id}_{batch_idx}.parquet")
+    df.to_parquet(outfile, index=False, compression="zstd")
+    if final:
+        print(f"[{pid}] Final save: batch {batch_idx} with {len(records)} records")
+    else:
+        print(f"[{pid}] Saved batch {batch_idx} with {len(records)} records")
+
+def new_run_id():
+    return f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+def load_parts(folder, columns=None):
+    """Read all part files of a mapping (Parquet, and JSON written by older runs) into one DataFrame.
+
+    Parts are read oldest first, so the last record of a work comes from its latest extraction.
+    """
+    frames = []
+    paths = glob.glob(os.path.join(folder, "*.parquet")) + glob.glob(os.path.join(folder, "*.json"))
+    for path in sorted(paths, key=lambda path: (os.path.getmtime(path), path)):
+        if path.endswith(".parquet"):
+            frames.append(pd.read_parquet(path, columns=columns))
+            continue
+        with open(path, "r") as f:
+            df = pd.DataFrame.from_records(json.load(f))
+        frames.append(df[columns] if columns else df)
+    frames = [df for df in frames if not df.empty]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat([df.astype({c: "object" for c in df.select_dtypes("category")}) for df in frames], ignore_index=True)
+
+def consolidate_mapping(folder, table_path=None):
+    """Merge a mapping's part files into one Parquet table (default: <folder>.parquet next to the folder)."""
+    table_path = table_path or f"{os.path.normpath(folder)}.parquet"
+    df = load_parts(folder)
+    # A work extracted by several runs (or first into a JSON part) is kept from its latest run
+    key = [column for column in ("work-id", "eurovoc-code") if column in df]
+    if key:
+        df = df.drop_duplicates(subset=key, keep="last", ignore_index=True)
+    if "eurovoc-code" in df:
+        df["eurovoc-code"] = df["eurovoc-code"].astype("category")
+    tmp_path = f"{table_path}.tmp"
+    df.to_parquet(tmp_path, index=False, compression="zstd")
+    os.replace(tmp_path, table_path)
+    print(f"Consolidated {len(df)} records from {folder} into {table_path}")
+    return table_path
+
+def consolidate_mappings():
+    """Consolidate the metadata, eurovoc and celex mappings configured in the environment."""
+    return [consolidate_mapping(folder) for folder in (work_metadata_mapping, work_eurovoc_mapping, work_celex_mapping)
+            if folder and os.path.isdir(folder)]
+
+def default_outputs():
+    return {
+        "metadata": work_metadata_mapping,
+        "eurovoc": work_eurovoc_mapping,
+        "celex": work_celex_mapping
+    }
+
+def record_size(record):
+    """Approximate size of a record in bytes, from the string length of its values."""
+    return sum(len(value) if isinstance(value, str) else len(str(value)) for value in record.values())
+
+class MappingWriter:
+    """Buffers mapping records and writes a Parquet part file every `part_records` records or `part_bytes` bytes."""
+
+    def __init__(self, outputs, pid):
+        self.outputs = outputs
+        self.pid = pid
+        self.run_id = new_run_id()
+        self.records = {name: [] for name in outputs}
+        self.sizes = {name: 0 for name in outputs}
+        self.batch_idx = {name: 0 for name in outputs}
+
+    def add(self, name, records):
+        self.records[name].extend(records)
+        self.sizes[name] += sum(record_size(record) for record in records)
+        if len(self.records[name]) >= part_records or self.sizes[name] >= part_bytes:
+            self.flush(name)
+
+    def flush(self, name, final=False):
+        if self.records[name]:
+            save_batch(self.outputs[name], self.pid, self.batch_idx[name], self.records[name], final=final,
+                       run_id=self.run_id)
+            self.batch_idx[name] += 1
+        self.records[name] = []
+        self.sizes[name] = 0
+
+    def close(self):
+        for name in self.records:
+            self.flush(name, final=True)
+
+def extract_batch(rows, outputs=None, folder=None, collect=False):
+    """Parse each work's RDF once and emit the requested mappings together.
+
+    `outputs` maps "metadata", "eurovoc" and/or "celex" to output folders; by
+    default all three are written to the folders configured in the environment.
+    `rows` is a DataFrame or a list of dicts with at least a "work-id".
+    With `collect`, nothing is written and {"records", "works", "errors"} is
+    returned instead, for the caller to aggregate (see run_extraction()).
+    """
+    outputs = outputs or default_outputs()
+    folder = folder or metadata_folder
     pid = current_process().pid
+    writer = None if collect else MappingWriter(outputs, pid)
+    collected = {name: [] for name in outputs}
+    errors = []
+    works = 0
+    started = time.perf_counter()
 
-    results = []
-    batch_idx = 0
-    for idx, row in rows.iterrows():
+    for idx, row in (rows.iterrows() if hasattr(rows, "iterrows") else enumerate(rows)):
         work_id = row["work-id"]
-        celex_expr_id = row["celex-expr-id"]
-        celex_man_id = row["celex-man-id"]
-        celex_cs_id = row["celex-cs-id"]
-        celex_number = None
-        cellar_uri = None
-
-        eurovoc_code = []
-        date_publication = None
-        # date_modified = None
-        # date_end = None
-        date_expiration = None
-        date_entry_into_force = None
-        created_agent = None
-        authored_agent = None
-        contributed_agent = None
-
-        mtd_path = os.path.join(metadata_folder, work_id, "tree_non_inferred.rdf")
+        mtd_path = os.path.join(folder, work_id, "tree_non_inferred.rdf")
         if not os.path.exists(mtd_path):
             continue
         try:
-            g = rdflib.Graph()
-            g.parse(mtd_path, format="xml")
+            work = read_work(mtd_path, row)
+            works += 1
         except Exception as e:
             print(f"[{pid}] Failed to parse {mtd_path} (format xml): {e}")
+            errors.append({"work-id": work_id, "error": str(e)})
             continue
 
-        # Eurovoc codes
-        for subj, obj in g.subject_objects(CDM.work_is_about_concept_eurovoc):
-            eurovoc_code.append(str(obj).split("/")[-1])
-
-        # Celex number (get first match)
-        celex_number = next(g.objects(None, CDM.resource_legal_id_celex), None)
-        if not celex_number:
-            celex_number = next(g.objects(None, CDM.celex_number), None)
-        
-        # If has celex number, get cellar uri, cellar man id, and cellar cs id (item identifier)
-        celex_uri = rdflib.URIRef(f"http://publications.europa.eu/resource/celex/{celex_number}.{celex_expr_id}.{celex_man_id}.{celex_cs_id}")
-        try:
-            cellar_uri = next(g.subjects(predicate=OWL.sameAs, object=celex_uri))
-        except Exception as e:
-            # print(f"[{pid}] Failed to get cellar_uri for {celex_uri}: {e}")
-            continue
-        
-        date_publication = next(g.objects(None, CDM.work_date_publication), None)
-        date_expiration = next(g.objects(None, CDM.date_expiration), None)
-        entry_date_uri = rdflib.URIRef("http://publications.europa.eu/ontology/cdm#date_entry-into-force")
-        date_entry_into_force = next(g.objects(None, entry_date_uri), None)
-        created_agent = next((get_pref_label(obj, g) for obj in g.objects(None, CDM.work_created_by_agent)), None)
-        authored_agent = next((get_pref_label(obj, g) for obj in g.objects(None, CDM.work_authored_by_agent)), None)
-        contributed_agent = next((get_pref_label(obj, g) for obj in g.objects(None, CDM.work_contributed_to_by_agent)), None)
-
-
-        """
-        for subj, pred, obj in g:
-            # Check eurovoc codes
-            if str(pred) == "http://publications.europa.eu/ontology/cdm#work_is_about_concept_eurovoc":
-                code = obj.split("/")[-1]
-                eurovoc_code.append(code)
-            # Check celex numbers
-            elif not celex_number and str(pred) in [
-                "http://publications.europa.eu/ontology/cdm#resource_legal_id_celex",
-                "http://publications.europa.eu/ontology/cdm#celex_number"
-            ]:
-                celex_number = obj
-                # If has celex number, get cellar uri, cellar man id, and cellar cs id (item identifier)
-                celex_uri = rdflib.URIRef(f"http://publications.europa.eu/resource/celex/{celex_number}.{celex_expr_id}.{celex_man_id}.{celex_cs_id}")
-                try:
-                    for uri in g.subjects(predicate=OWL.sameAs, object=celex_uri):
-                        cellar_uri = uri
-                        break
-                except Exception as e:
-                    print(f"[{pid}] Failed to iterate subjects as cellar_uri for {celex_uri}: {e}")
-                    continue
-            # Check for author
-            elif str(pred) == "http://publications.europa.eu/ontology/cdm#work_created_by_agent":
-                created_agent = get_pref_label(obj, g)
-            elif str(pred) == "http://publications.europa.eu/ontology/cdm#work_authored_by_agent":
-                authored_agent = get_pref_label(obj, g)
-            elif str(pred) == "http://publications.europa.eu/ontology/cdm#work_contributed_to_by_agent":
-                contributed_agent = get_pref_label(obj, g)
-            elif str(pred) == "http://publications.europa.eu/ontology/cdm#work_date_publication":
-                date_publication = obj
-            elif str(pred) == "http://publications.europa.eu/ontology/cdm#work_date_modified":
-                date_modified = obj
-        """      
-
-
-        meta = row.to_dict()
-        meta.update({
-            "celex-number": str(celex_number) if celex_number else celex_number,
-            "cellar-uri": str(cellar_uri) if cellar_uri else cellar_uri,
-            "eurovoc-codes": eurovoc_code,
-            "date-publication": date_publication,
-            "date-entry-into-force": date_entry_into_force,
-            "date-expiration": date_expiration,
-            "created-agent": created_agent,
-            "authored-agent": authored_agent,
-            "contributed-agent": contributed_agent
-        })
-        results.append(meta)
-
-        if (idx + 1) % 1000 == 0:
-            outfile = os.path.join(work_metadata_mapping, f"{pid}_{batch_idx}.json")
-            with open(outfile, "w") as f:
-                json.dump(results, f, indent=4)
-            print(f"[{pid}] Saved batch {batch_idx} with {len(results)} records")
-            results = []
-            batch_idx += 1
-
-    if results:
-        outfile = os.path.join(work_metadata_mapping, f"{pid}_{batch_idx}.json")
-        with open(outfile, "w") as f:
-            json.dump(results, f, indent=4)
-        print(f"[{pid}] Final save: batch {batch_idx} with {len(results)} records")
-        # print(results)
-    
+        records = {}
+        if "eurovoc" in outputs:
+            records["eurovoc"] = [{"work-id": work_id, "eurovoc-code": code} for code in work["eurovoc-codes"]]
+        if "celex" in outputs:
+            records["celex"] = [{"work-id": work_id, "celex": work["celex-number"]}]
+        # Works without a matching cellar URI are left out of the metadata mapping
+        if "metadata" in outputs and work["cellar-uri"]:
+            meta = dict(row)
+            meta.update(work)
+            records["metadata"] = [meta]
+        for name, values in records.items():
+            if collect:
+                collected[name].extend(values)
+            else:
+                writer.add(name, values)
+
+    elapsed = time.perf_counter() - started
+    if collect:
+        return {"records": collected, "works": works, "errors": errors}
+    writer.close()
+    print(f"[{pid}] Parsed {works} works in {elapsed:.1f}s ({works / elapsed if elapsed else 0:.1f} works/sec)")
     return True
 
-#################################
-def get_eurovoc_batch(rows):
-    """Process a batch of rows to extract Eurovoc codes from RDF files."""
+def run_extraction(rows, outputs=None, folder=None, num_processes=4, unit_size=200):
+    """Extract a whole corpus with dynamically scheduled work units.
 
-    results = []
-    pid = current_process().pid
-    batch_idx = 0
+    Workers return their records instead of writing per-PID files; this process
+    writes the part files and collects parse errors.
+    """
+    outputs = outputs or default_outputs()
+    writer = MappingWriter(outputs, os.getpid())
+    totals = {"works": 0, "errors": []}
 
-    for idx, row in rows.iterrows():
-        work_id = row["work-id"]
-        path = os.path.join(metadata_folder, work_id, "tree_non_inferred.rdf")
-        if not os.path.exists(path):
-            continue
-        try:
-            g = rdflib.Graph()
-            g.parse(path, format="xml")
-            for subj, pred, obj in g:
-                if str(pred) == "http://publications.europa.eu/ontology/cdm#work_is_about_concept_eurovoc":
-                    code = obj.split("/")[-1]
-                    results.append({"work-id": work_id, "eurovoc-code": code})
-        except Exception as e:
-            print(f"[{pid}] Failed to parse {work_id}: {e}")
-        
-        if (idx + 1) % 1000 == 0:
-            outfile = os.path.join(work_eurovoc_mapping, f"{pid}_{batch_idx}.json")
-            with open(outfile, "w") as f:
-                json.dump(results, f, indent=4)
-            print(f"[{pid}] Saved batch {batch_idx} with {len(results)} records")
-            results = []
-            batch_idx += 1
-
-    if results:
-        outfile = os.path.join(work_eurovoc_mapping, f"{pid}_{batch_idx}.json")
-        with open(outfile, "w") as f:
-            json.dump(results, f, indent=4)
-        print(f"[{pid}] Final save: batch {batch_idx} with {len(results)} records")
+    def on_result(result):
+        for name, records in result["records"].items():
+            writer.add(name, records)
+        totals["works"] += result["works"]
+        totals["errors"].extend(result["errors"])
 
-    return True
+    report = run_parallel(extract_batch, rows, outputs, folder, True,
+                          num_processes=num_processes, unit_size=unit_size, on_result=on_result)
+    writer.close()
+    print(f"Parsed {totals['works']} works ({totals['works'] / report['seconds'] if report['seconds'] else 0:.1f} works/sec), "
+          f"{len(totals['errors'])} parse errors, {len(report['errors'])} failed units")
+    return {"works": totals["works"], "errors": totals["errors"], "failed_units": report["errors"]}
 
-def get_celex_batch(rows):
-    """Process a batch of rows to extract Celex numbers from RDF files."""
-    results = []
-    pid = current_process().pid
-    batch_idx = 0
+def process_metadata_batch(rows):
+    return extract_batch(rows, {"metadata": work_metadata_mapping})
 
-    for idx, row in rows.iterrows():
-        work_id = row["work-id"]
-        path = os.path.join(metadata_folder, work_id, "tree_non_inferred.rdf")
-        if not os.path.exists(path):
-            continue
-        try:
-            g = rdflib.Graph()
-            g.parse(path, format="xml")
-            celex_number = None
-            for subj, pred, obj in g:
-                if str(pred) in [
-                    "http://publications.europa.eu/ontology/cdm#resource_legal_id_celex",
-                    "http://publications.europa.eu/ontology/cdm#celex_number"
-                ]:
-                    celex_number = obj
-                    break
-            
-            if celex_number:
-                results.append({"work-id": work_id, "celex": celex_number})
-            else:
-                results.append({"work-id": work_id, "celex": None})
+def get_eurovoc_batch(rows):
+    """Process a batch of rows to extract Eurovoc codes from RDF files."""
+    return extract_batch(rows, {"eurovoc": work_eurovoc_mapping})
 
-        except Exception as e:
-            print(f"[{pid}] Failed to parse {work_id}: {e}")
-        
-        if (idx + 1) % 1000 == 0:
-            outfile = os.path.join(work_celex_mapping, f"{pid}_{batch_idx}.json")
-            with open(outfile, "w") as f:
-                json.dump(results, f, indent=4)
-            print(f"[{pid}] Saved batch {batch_idx} with {len(results)} records")
-            results = []
-            batch_idx += 1
-
-    if results:
-        outfile = os.path.join(work_celex_mapping, f"{pid}_{batch_idx}.json")
-        with open(outfile, "w") as f:
-            json.dump(results, f, indent=4)
-        print(f"[{pid}] Final save: batch {batch_idx} with {len(results)} records")
+def get_celex_batch(rows):
+    """Process a batch of rows to extract Celex numbers from RDF files."""
+    return extract_batch(rows, {"celex": work_celex_mapping})
 
-    return True
+def benchmark_extraction(rows, folder=None):
+    """Works/sec of the former one parse per mapping (three), one rdflib parse, and the streaming extractor."""
+    folder = folder or metadata_folder
+    paths = [(os.path.join(folder, row["work-id"], "tree_non_inferred.rdf"), row)
+             for _, row in (rows.iterrows() if hasattr(rows, "iterrows") else enumerate(rows))]
+    paths = [(path, row) for path, row in paths if os.path.exists(path)]
+    timings = {}
+    rdflib_extract = lambda path, row: extract_work(parse_work(path), row)
+    for name, extract, passes in (("three-pass", rdflib_extract, 3), ("single-pass", rdflib_extract, 1),
+                                  ("streaming", extract_work_streaming, 1)):
+        started = time.perf_counter()
+        for path, row in paths:
+            for _ in range(passes):
+                extract(path, row)
+        elapsed = time.perf_counter() - started
+        timings[name] = len(paths) / elapsed if elapsed else None
+        print(f"{name}: {len(paths)} works in {elapsed:.1f}s ({timings[name]:.1f} works/sec)")
+    return timings
@@ -0,0 +1,115 @@
+import xml.etree.ElementTree as ET
+
+RDF_NS = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+CDM_NS = "http://publications.europa.eu/ontology/cdm#"
+XML_NS = "http://www.w3.org/XML/1998/namespace"
+OWL_SAME_AS = "{http://www.w3.org/2002/07/owl#}sameAs"
+SKOS_PREF_LABEL = "{http://www.w3.org/2004/02/skos/core#}prefLabel"
+RDFS_LABEL = "{http://www.w3.org/2000/01/rdf-schema#}label"
+CELEX_RESOURCE = "http://publications.europa.eu/resource/celex/"
+
+RDF_ABOUT = f"{{{RDF_NS}}}about"
+RDF_RESOURCE = f"{{{RDF_NS}}}resource"
+RDF_ID = f"{{{RDF_NS}}}ID"
+RDF_ATTRIBUTES = {RDF_ABOUT, RDF_RESOURCE, f"{{{RDF_NS}}}datatype", f"{{{XML_NS}}}lang"}
+
+EUROVOC = f"{{{CDM_NS}}}work_is_about_concept_eurovoc"
+CELEX_PREDICATES = [f"{{{CDM_NS}}}resource_legal_id_celex", f"{{{CDM_NS}}}celex_number"]
+DATES = {
+    f"{{{CDM_NS}}}work_date_publication": "date-publication",
+    f"{{{CDM_NS}}}date_entry-into-force": "date-entry-into-force",
+    f"{{{CDM_NS}}}date_expiration": "date-expiration",
+}
+AGENTS = {
+    f"{{{CDM_NS}}}work_created_by_agent": "created-agent",
+    f"{{{CDM_NS}}}work_authored_by_agent": "authored-agent",
+    f"{{{CDM_NS}}}work_contributed_to_by_agent": "contributed-agent",
+}
+
+
+class UnsupportedRDF(Exception):
+    """The file uses RDF/XML features the streaming extractor does not handle."""
+
+
+def iter_statements(mtd_path):
+    """Yield (subject, predicate, object) for each property of the top-level node elements.
+
+    Only the flat layout of CDM notices is understood (one node element per
+    subject with rdf:about, properties as child elements with rdf:resource or
+    text). Blank nodes (rdf:nodeID or no identifier, e.g. owl:Axiom annotations)
+    carry none of the extracted predicates and are skipped. Elements are cleared
+    once read, so memory does not grow with the file.
+    """
+    depth = 0
+    root = None
+    for event, elem in ET.iterparse(mtd_path, events=("start", "end")):
+        if event == "start":
+            depth += 1
+            if root is None:
+                root = elem
+            continue
+        depth -= 1
+        if depth != 1:
+            continue
+
+        subject = elem.get(RDF_ABOUT)
+        if subject is None and elem.get(RDF_ID) is None:
+            root.clear()  # blank node
+            continue
+        if subject is None or "://" not in subject:
+            raise UnsupportedRDF(f"node without absolute rdf:about in {mtd_path}")
+        if set(elem.attrib) - RDF_ATTRIBUTES:
+            raise UnsupportedRDF(f"property attributes on {subject} in {mtd_path}")
+        for prop in elem:
+            if len(prop) or set(prop.attrib) - RDF_ATTRIBUTES:
+                raise UnsupportedRDF(f"nested or abbreviated property {prop.tag} in {mtd_path}")
+            obj = prop.get(RDF_RESOURCE)
+            yield subject, prop.tag, obj if obj is not None else (prop.text or "")
+        root.clear()  # drop the processed node element
+
+
+def extract_work_streaming(mtd_path, row):
+    """Same result as preprocess.extract_work(), read in one streaming pass over the file.
+
+    Raises:
+        UnsupportedRDF: if the file needs a full RDF parser
+    """
+    eurovoc_code = []
+    celex_numbers = {}
+    same_as = {}
+    dates = {}
+    agent_uris = {}
+    labels = {}
+    for subject, predicate, obj in iter_statements(mtd_path):
+        if predicate == EUROVOC:
+            eurovoc_code.append(obj.split("/")[-1])
+        elif predicate in CELEX_PREDICATES:
+            celex_numbers.setdefault(predicate, obj)
+        elif predicate == OWL_SAME_AS and obj.startswith(CELEX_RESOURCE):
+            same_as.setdefault(obj, subject)
+        elif predicate in DATES:
+            dates.setdefault(DATES[predicate], obj)
+        elif predicate in AGENTS:
+            agent_uris.setdefault(AGENTS[predicate], obj)
+        elif predicate in (SKOS_PREF_LABEL, RDFS_LABEL):
+            labels.setdefault((subject, predicate), obj)
+
+    # Celex number, preferring resource_legal_id_celex, then the matching cellar uri
+    celex_number = next((celex_numbers[p] for p in CELEX_PREDICATES if celex_numbers.get(p)), None)
+    cellar_uri = None
+    if celex_number and all(key in row for key in ("celex-expr-id", "celex-man-id", "celex-cs-id")):
+        cellar_uri = same_as.get(
+            f"{CELEX_RESOURCE}{celex_number}.{row['celex-expr-id']}.{row['celex-man-id']}.{row['celex-cs-id']}"
+        )
+
+    def label(uri):
+        return labels.get((uri, SKOS_PREF_LABEL)) or labels.get((uri, RDFS_LABEL)) or uri
+
+    work = {
+        "celex-number": celex_number,
+        "cellar-uri": cellar_uri,
+        "eurovoc-codes": eurovoc_code,
+    }
+    work.update({key: dates.get(key) for key in DATES.values()})
+    work.update({key: label(agent_uris[key]) if key in agent_uris else None for key in AGENTS.values()})
+    return work
@@ -0,0 +1,106 @@
+import os
+import sys
+import json
+import time
+import argparse
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from common.pipeline_base import PIPELINES
+
+REGIONS = ["eu", "sg", "us"]
+
+
+def load_pipelines(regions=REGIONS):
+    """Import <region>.pipeline for each region so its pipeline registers itself."""
+    for region in regions:
+        try:
+            importlib.import_module(f"{region}.pipeline")
+        except ModuleNotFoundError as e:
+            # Regions without a pipeline module yet are skipped; missing dependencies are not
+            if e.name not in (region, f"{region}.pipeline"):
+                raise
+    return {region: PIPELINES[region] for region in regions if region in PIPELINES}
+
+
+def print_progress(region, stage, **info):
+    if info.get("started"):
+        print(f"[{region}] {stage} started")
+    elif info.get("total") is None:
+        print(f"[{region}] {stage} {info['done']} done")
+    else:
+        print(f"[{region}] {stage} {info['done']}/{info['total']}")
+
+
+def run_pipeline(pipeline_cls, stage_workers=None, progress=print_progress, streaming=None, use_cache=True):
+    started = time.perf_counter()
+    try:
+        report = pipeline_cls().run(stage_workers=stage_workers, progress=progress, streaming=streaming,
+                                     use_cache=use_cache)
+        report["status"] = "succeeded"
+    except Exception as e:
+        report = {"region": pipeline_cls.region, "stages": {}, "status": "failed", "error": f"{type(e).__name__}: {e}"}
+        print(f"[{pipeline_cls.region}] failed: {report['error']}")
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def run_all(regions=REGIONS, stage_workers=None, max_parallel=None, progress=print_progress, streaming=None,
+            use_cache=True):
+    """Run the registered pipelines of `regions` concurrently and return their reports.
+
+    `streaming` forces streaming mode on or off; by default each pipeline's own setting is used.
+    With `use_cache=False` every stage re-runs instead of reusing cached output.
+    """
+    pipelines = load_pipelines(regions)
+    for region in regions:
+        if region not in pipelines:
+            print(f"[{region}] no pipeline registered, skipping")
+    if not pipelines:
+        return []
+    with ThreadPoolExecutor(max_workers=max_parallel or len(pipelines)) as pool:
+        futures = [pool.submit(run_pipeline, cls, stage_workers, progress, streaming, use_cache) for cls in pipelines.values()]
+        return [future.result() for future in futures]
+
+
+def print_summary(reports):
+    print(f"\n{'region':<8}{'status':<11}{'stage':<9}{'seconds':>9}{'in':>9}{'out':>9}")
+    for report in reports:
+        print(f"{report['region']:<8}{report['status']:<11}{'total':<9}{report['seconds']:>9.2f}")
+        for stage, timing in report["stages"].items():
+            items_in = "" if timing["items_in"] is None else timing["items_in"]
+            items_out = "" if timing["items_out"] is None else timing["items_out"]
+            cached = f"  ({timing['cached']} cached)" if timing.get("cached") else ""
+            print(f"{'':<19}{stage:<9}{timing['seconds']:>9.2f}{items_in:>9}{items_out:>9}{cached}")
+        if report.get("error"):
+            print(f"{'':<19}{report['error']}")
+
+
+def parse_stage_workers(values):
+    stage_workers = {}
+    for value in values or []:
+        stage, workers = value.split("=")
+        stage_workers[stage] = int(workers)
+    return stage_workers
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the regional ingestion pipelines.")
+    parser.add_argument("--regions", nargs="+", default=REGIONS)
+    parser.add_argument("--workers", nargs="*", metavar="STAGE=N", help="threads per stage, e.g. process=8 embed=2")
+    parser.add_argument("--max-parallel", type=int, default=None, help="pipelines run at the same time")
+    parser.add_argument("--streaming", action="store_true", default=None,
+                        help="run stages concurrently through bounded queues")
+    parser.add_argument("--no-cache", action="store_true", help="ignore cached stage output")
+    parser.add_argument("--report", help="write the summary report as JSON to this file")
+    args = parser.parse_args()
+
+    reports = run_all(args.regions, parse_stage_workers(args.workers), args.max_parallel, streaming=args.streaming,
+                      use_cache=not args.no_cache)
+    print_summary(reports)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(reports, f, indent=4)
+    sys.exit(1 if any(report["status"] == "failed" for report in reports) else 0)
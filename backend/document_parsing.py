@@ -0,0 +1,58 @@
+from langchain_community.document_loaders import PyPDFLoader, TextLoader, Docx2txtLoader
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from typing import List
+import os
+
+# Parsing only: this module is preloaded by the bulk upload parse workers and
+# must stay free of side effects (no models, indexes or app state)
+
+LOADERS = {
+    '.pdf': PyPDFLoader,
+    '.txt': TextLoader,
+    '.docx': Docx2txtLoader
+}
+
+def load_document(file_path: str):
+    """
+    Load a document with the loader matching its extension.
+
+    Raises:
+        FileNotFoundError: If the file does not exist
+        ValueError: If the file type is unsupported
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File not found: {file_path}")
+
+    Loader = LOADERS.get(os.path.splitext(file_path)[1].lower())
+    if not Loader:
+        raise ValueError(f"Unsupported file type: {file_path}")
+    return Loader(file_path).load()
+
+def split_documents(file_path: str, documents: List, chunk_size: int = 1000, chunk_overlap: int = 200):
+    """
+    Split loaded documents into chunks.
+
+    Raises:
+        ValueError: If the documents yield no text
+    """
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,  # Slightly larger chunks
+        chunk_overlap=chunk_overlap,
+        length_function=len
+    )
+    chunks = text_splitter.split_documents(documents)
+    if not chunks:
+        raise ValueError(f"No text extracted from {file_path}")
+    return chunks
+
+def load_and_split(file_path: str, chunk_size: int = 1000, chunk_overlap: int = 200):
+    """
+    Load a document and split it into chunks.
+
+    Runs in the bulk upload parse workers.
+
+    Raises:
+        FileNotFoundError: If the file does not exist
+        ValueError: If the file type is unsupported or yields no text
+    """
+    return split_documents(file_path, load_document(file_path), chunk_size, chunk_overlap)
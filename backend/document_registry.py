@@ -0,0 +1,91 @@
+from datetime import datetime
+from typing import List, Optional
+import threading
+import sqlite3
+import json
+import os
+
+SCHEMA_VERSION = 1
+
+
+class DocumentRegistry:
+    def __init__(self, db_path: str = "uploaded_documents.db", legacy_json_path: Optional[str] = None):
+        """
+        Registry of uploaded documents backed by SQLite.
+
+        Content hashes are unique, so duplicate detection is a single indexed
+        lookup and concurrent uploads of the same file cannot both be recorded.
+
+        Args:
+            db_path: SQLite database file (default: "uploaded_documents.db")
+            legacy_json_path: uploaded_documents.json to import on first use, if any
+        """
+        self.db_path = os.path.abspath(db_path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "filename TEXT NOT NULL, "
+                "hash TEXT NOT NULL, "
+                "upload_time TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_documents_hash ON documents (hash)")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            self._migrate(legacy_json_path)
+
+    def _migrate(self, legacy_json_path: Optional[str]):
+        """One-time import of the JSON document list; later duplicates of a hash are dropped."""
+        documents = []
+        if legacy_json_path and os.path.exists(legacy_json_path):
+            try:
+                with open(legacy_json_path, 'r') as f:
+                    documents = json.load(f)
+            except json.JSONDecodeError:
+                documents = []
+        with self._lock, self._conn:
+            imported = self._conn.executemany(
+                "INSERT OR IGNORE INTO documents (filename, hash, upload_time) VALUES (?, ?, ?)",
+                [(doc["filename"], doc["hash"], doc["upload_time"]) for doc in documents]
+            ).rowcount
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        if documents:
+            print(f"Imported {imported} of {len(documents)} documents from {legacy_json_path}")
+
+    def exists(self, file_hash: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM documents WHERE hash = ?", (file_hash,)).fetchone()
+        return row is not None
+
+    def add(self, filename: str, file_hash: str) -> bool:
+        """
+        Record an uploaded document.
+
+        Returns:
+            bool: False if a document with the same hash is already registered
+        """
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT INTO documents (filename, hash, upload_time) VALUES (?, ?, ?)",
+                    (filename, file_hash, datetime.now().isoformat())
+                )
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def list(self, offset: int = 0, limit: Optional[int] = None) -> List[dict]:
+        """Return documents in upload order, optionally one page at a time."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT filename, hash, upload_time FROM documents ORDER BY id LIMIT ? OFFSET ?",
+                (-1 if limit is None else limit, offset)
+            ).fetchall()
+        return [dict(row) for row in rows]
@@ -0,0 +1,239 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+import threading
+import time
+import uuid
+import os
+
+
+class QueueFull(Exception):
+    """Raised when too many ingestion jobs are already waiting."""
+
+
+class DuplicateDocument(Exception):
+    """Raised when every submitted file is already indexed or being processed."""
+
+    def __init__(self, files: List[Tuple[str, str, str]]):
+        super().__init__("File already exists in database")
+        self.files = files
+
+
+class IngestionJobQueue:
+    def __init__(self, uploader, max_workers: int = 2, max_pending: int = 100,
+                 max_finished: int = 1000, on_success: Optional[Callable] = None,
+                 is_indexed: Optional[Callable] = None):
+        """
+        Run document ingestion in a bounded background worker pool.
+
+        Each submitted file becomes a job whose stage, progress and per-stage
+        timings can be polled while it runs. Index writes are serialized by the
+        uploader's ShardedIndex, so parallel jobs only contend on the final,
+        cheap shard commit.
+
+        Args:
+            uploader: DocumentUploader used to process files
+            max_workers: Number of files processed concurrently (default: 2)
+            max_pending: Maximum number of queued or running jobs (default: 100)
+            max_finished: Number of finished jobs kept for status queries (default: 1000)
+            on_success: Called as on_success(filename, file_hash) for each file indexed
+            is_indexed: Called as is_indexed(file_hash) to reject files already indexed
+        """
+        self.uploader = uploader
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self.on_success = on_success
+        self.is_indexed = is_indexed
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingestion")
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._unregistered = set()  # hashes indexed but not added to the registry by on_success
+
+    def _pending(self):
+        return [job for job in self._jobs.values() if job["status"] in ("queued", "running")]
+
+    def is_pending(self, file_hash: str) -> bool:
+        """Whether a file with this hash is already queued or being processed."""
+        with self._lock:
+            return any(file_hash in job["hashes"] for job in self._pending())
+
+    def submit(self, file_path: str, filename: str, file_hash: str) -> str:
+        """
+        Queue a file for ingestion. The file is deleted once the job finishes.
+
+        Returns:
+            str: The job id
+
+        Raises:
+            DuplicateDocument: If the file is already indexed or being processed
+            QueueFull: If max_pending jobs are already queued or running
+        """
+        return self._submit([(file_path, filename, file_hash)], bulk=False)[0]
+
+    def submit_bulk(self, files: List[Tuple[str, str, str]]) -> Tuple[str, List]:
+        """
+        Queue several files as one job, parsed in parallel and committed to the
+        index at once. Per-file outcomes and throughput stats are reported in
+        the job's "result" when it finishes. Files already indexed, being
+        processed, or repeated within `files` are left out of the job.
+
+        Args:
+            files: List of (file_path, filename, file_hash) tuples
+
+        Returns:
+            Tuple: (job id, list of the duplicate files left out)
+
+        Raises:
+            DuplicateDocument: If every file is a duplicate
+            QueueFull: If max_pending jobs are already queued or running
+        """
+        return self._submit(files, bulk=True)
+
+    def _submit(self, files: List[Tuple[str, str, str]], bulk: bool) -> Tuple[str, List]:
+        # The duplicate check and the job insert happen under one lock, so two
+        # concurrent uploads of the same file cannot both be queued. A file stays
+        # pending until on_success has added it to the registry, or reserved for
+        # good if it was indexed but could not be registered.
+        with self._lock:
+            reserved = {file_hash for job in self._pending() for file_hash in job["hashes"]} | self._unregistered
+            accepted, duplicates = [], []
+            for file in files:
+                file_hash = file[2]
+                if file_hash in reserved or (self.is_indexed and self.is_indexed(file_hash)):
+                    duplicates.append(file)
+                else:
+                    reserved.add(file_hash)
+                    accepted.append(file)
+            if not accepted:
+                raise DuplicateDocument(duplicates)
+            if len(self._pending()) >= self.max_pending:
+                raise QueueFull("Too many documents are being processed, try again later")
+            files = accepted
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "filenames": [filename for _, filename, _ in files],
+                "hashes": [file_hash for _, _, file_hash in files],
+                "status": "queued",
+                "stage": "queued",
+                "chunks_embedded": 0,
+                "chunks_total": None,
+                "stage_seconds": {},
+                "submitted_at": datetime.now().isoformat(),
+                "started_at": None,
+                "finished_at": None,
+                "error": None,
+                "result": None,
+                "_files": files,
+                "_bulk": bulk,
+                "_submitted": time.perf_counter(),
+            }
+            self._trim()
+        self._executor.submit(self._run, job_id)
+        return job_id, duplicates
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in ("succeeded", "failed")]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _run(self, job_id: str):
+        job = self._jobs[job_id]
+        stage_started = time.perf_counter()
+        job_started = stage_started
+        with self._lock:
+            job["stage_seconds"]["queued"] = round(stage_started - job["_submitted"], 3)
+            job.update(status="running", stage="starting", started_at=datetime.now().isoformat())
+
+        def progress(stage, **info):
+            nonlocal stage_started
+            now = time.perf_counter()
+            with self._lock:
+                if stage != job["stage"]:
+                    job["stage_seconds"][job["stage"]] = round(now - stage_started, 3)
+                    job["stage"] = stage
+                    stage_started = now
+                job.update(info)
+
+        try:
+            if job["_bulk"]:
+                result = self._run_bulk(job, progress)
+                if not result["stats"]["succeeded"]:
+                    progress("failed")
+                    self._update(job_id, status="failed", error="No document could be processed", result=result)
+                    return
+            else:
+                path, filename, file_hash = job["_files"][0]
+                chunks = self.uploader.process_document(path, progress=progress)
+                result = {"chunks": chunks}
+                registry_error = self._register(filename, file_hash)
+                if registry_error:
+                    result["registry_error"] = registry_error
+                print(f"Successfully processed: {filename}")
+            progress("done")
+            self._update(job_id, status="succeeded", result=result)
+        except Exception as e:
+            print(f"Error processing {', '.join(job['filenames'])}: {str(e)}")
+            progress("failed")
+            self._update(job_id, status="failed", error=str(e))
+        finally:
+            self._update(job_id, finished_at=datetime.now().isoformat(),
+                         total_seconds=round(time.perf_counter() - job_started, 3))
+            for path, _, _ in job["_files"]:
+                if os.path.exists(path):
+                    os.remove(path)
+                try:
+                    os.rmdir(os.path.dirname(path))  # per-upload temp directory
+                except OSError:
+                    pass
+
+    def _run_bulk(self, job: dict, progress: Callable) -> dict:
+        files = {path: (filename, file_hash) for path, filename, file_hash in job["_files"]}
+        report = self.uploader.upload_documents_bulk(list(files), progress=progress)
+        for outcome in report["files"]:
+            filename, file_hash = files[outcome["file"]]
+            outcome["file"] = filename
+            if outcome["status"] == "succeeded":
+                registry_error = self._register(filename, file_hash)
+                if registry_error:
+                    outcome["registry_error"] = registry_error
+        return report
+
+    def _register(self, filename: str, file_hash: str) -> Optional[str]:
+        """
+        Call on_success for a file that is already in the index.
+
+        A registry failure does not fail the upload, as its chunks are indexed;
+        the hash stays reserved so a retry does not index the file twice.
+
+        Returns:
+            Optional[str]: The registry error, if any
+        """
+        if not self.on_success:
+            return None
+        try:
+            self.on_success(filename, file_hash)
+            return None
+        except Exception as e:
+            print(f"Indexed {filename} but could not register it: {str(e)}")
+            with self._lock:
+                self._unregistered.add(file_hash)
+            return str(e)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Return a snapshot of a job's status, or None if unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = {key: value for key, value in job.items() if not key.startswith("_")}
+            snapshot["stage_seconds"] = dict(job["stage_seconds"])
+            return snapshot
+
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,101 @@
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+import threading
+import time
+
+# Upper bounds (seconds) of the latency histogram buckets, from cache hits to slow LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class StageMetrics:
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, window: int = 1024,
+                 prefix: str = "regguru"):
+        """
+        Latency histograms per (operation, stage), e.g. ("chat", "llm_call").
+
+        Every observation is counted in cumulative histogram buckets, and the
+        most recent `window` observations of each stage are kept to report
+        p50/p95/p99. Both are rendered in the Prometheus text format.
+
+        Args:
+            buckets: Upper bounds of the histogram buckets in seconds
+            window: Number of recent observations per stage used for quantiles (default: 1024)
+            prefix: Prefix of the exported metric names (default: "regguru")
+        """
+        self.buckets = tuple(sorted(buckets))
+        self.window = window
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._series = {}  # (operation, stage) -> {"counts", "sum", "count", "recent"}
+
+    def observe(self, operation: str, stage: str, seconds: float):
+        with self._lock:
+            series = self._series.get((operation, stage))
+            if series is None:
+                series = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0,
+                          "recent": deque(maxlen=self.window)}
+                self._series[(operation, stage)] = series
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += seconds
+            series["count"] += 1
+            series["recent"].append(seconds)
+
+    @contextmanager
+    def timer(self, operation: str, stage: str):
+        """Time the enclosed block as one observation of `stage`, also when it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(operation, stage, time.perf_counter() - started)
+
+    @staticmethod
+    def _quantile(samples: List[float], q: float) -> Optional[float]:
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def summary(self) -> Dict[str, Dict[str, dict]]:
+        """{operation: {stage: {"count", "sum", "p50", "p95", "p99"}}} over the recent window."""
+        with self._lock:
+            snapshot = {key: (series["count"], series["sum"], sorted(series["recent"]))
+                        for key, series in self._series.items()}
+        result = {}
+        for (operation, stage), (count, total, samples) in sorted(snapshot.items()):
+            stats = {"count": count, "sum": round(total, 6)}
+            for q in QUANTILES:
+                value = self._quantile(samples, q)
+                stats[f"p{int(q * 100)}"] = round(value, 6) if value is not None else None
+            result.setdefault(operation, {})[stage] = stats
+        return result
+
+    def render(self) -> str:
+        """All series in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            snapshot = {key: (list(series["counts"]), series["count"], series["sum"], sorted(series["recent"]))
+                        for key, series in self._series.items()}
+        histogram = f"{self.prefix}_stage_duration_seconds"
+        summary = f"{self.prefix}_stage_latency_seconds"
+        lines = [f"# HELP {histogram} Duration of request and ingestion stages.",
+                 f"# TYPE {histogram} histogram"]
+        for (operation, stage), (counts, count, total, _) in sorted(snapshot.items()):
+            labels = f'operation="{operation}",stage="{stage}"'
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{histogram}_bucket{{{labels},le="{bound}"}} {bucket_count}')
+            lines.append(f'{histogram}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"{histogram}_sum{{{labels}}} {total}")
+            lines.append(f"{histogram}_count{{{labels}}} {count}")
+        lines += [f"# HELP {summary} Stage latency quantiles over the last {self.window} observations.",
+                  f"# TYPE {summary} summary"]
+        for (operation, stage), (_, count, total, samples) in sorted(snapshot.items()):
+            labels = f'operation="{operation}",stage="{stage}"'
+            for q in QUANTILES:
+                value = self._quantile(samples, q)
+                lines.append(f'{summary}{{{labels},quantile="{q}"}} {"NaN" if value is None else value}')
+            lines.append(f"{summary}_sum{{{labels}}} {total}")
+            lines.append(f"{summary}_count{{{labels}}} {count}")
+        return "\n".join(lines) + "\n"
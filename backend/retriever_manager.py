@@ -0,0 +1,97 @@
+from sharded_index import ShardedIndex, ShardedFAISS, read_generation
+from typing import Optional, Tuple
+import threading
+import os
+
+
+class RetrieverManager:
+    def __init__(self, vectorstore_directory: str, embeddings, k: int = 5):
+        """
+        Keep one FAISS vectorstore resident for the whole process.
+
+        The index is loaded lazily on first use and reloaded only when the
+        index on disk changes, so requests are served from memory. Shards
+        that were already loaded are reused, so a new delta shard only costs
+        loading that shard.
+
+        Every get() stats manifest.json (or a legacy index.faiss) and reads
+        the generation counter; a reload happens only when the (generation,
+        mtime, size) fingerprint differs from the loaded one. Writers bump the
+        generation on append, so a new delta triggers a reload; compaction
+        keeps it, and its rewrite of the manifest is picked up by mtime/size.
+        If a shard listed in the manifest is missing (deleted by a concurrent
+        compaction), the manifest is re-read once; if it is still missing the
+        error is raised, the previously loaded generation stays resident and
+        the next get() tries again.
+
+        Args:
+            vectorstore_directory: Directory holding the sharded FAISS index
+            embeddings: Embeddings used to query the index
+            k: Number of chunks retrieved per query (default: 5)
+        """
+        self.vectorstore_directory = os.path.abspath(vectorstore_directory)
+        self.embeddings = embeddings
+        self.k = k
+        self.index = ShardedIndex(vectorstore_directory, embeddings)
+        self._shards = {}  # shard name -> loaded FAISS shard
+        self._lock = threading.Lock()
+        self._fingerprint = None
+        self._state = None  # (generation, vectorstore), swapped as a whole
+
+    def has_index(self) -> bool:
+        return self.index.exists()
+
+    def _current_fingerprint(self) -> Optional[Tuple]:
+        """Cheap stat-based fingerprint of the index generation on disk."""
+        for path in (self.index.manifest_path(), os.path.join(self.vectorstore_directory, "index.faiss")):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            return (read_generation(self.vectorstore_directory), stat.st_mtime_ns, stat.st_size)
+        return None
+
+    def _load_shards(self) -> dict:
+        # A shard retired by compaction may be deleted after we read the manifest; re-read it once
+        for attempt in range(2):
+            manifest = self.index.read_manifest()
+            try:
+                return {name: self._shards.get(name) or self.index.load_shard(name)
+                        for name in self.index.shard_paths(manifest)}
+            except FileNotFoundError:
+                if attempt:
+                    raise
+
+    def _load(self):
+        shards = self._load_shards()
+        self._shards = shards
+        return ShardedFAISS(list(shards.values()), self.embeddings)
+
+    def get(self):
+        """
+        Return the resident (generation, vectorstore) tuple.
+
+        Reloads the index if a new generation has been written since the last
+        load. Concurrent callers keep using the previous generation until the
+        new one is fully loaded.
+
+        Returns:
+            Tuple: (generation, vectorstore), or None if no index exists
+        """
+        fingerprint = self._current_fingerprint()
+        if fingerprint is None:
+            return None
+        if fingerprint == self._fingerprint and self._state is not None:
+            return self._state
+
+        with self._lock:
+            # Another request may have reloaded while we waited for the lock
+            if fingerprint == self._fingerprint and self._state is not None:
+                return self._state
+            if not self.has_index():
+                return None
+            print(f"Loading vectorstore generation {fingerprint[0]}...")
+            self._state = (fingerprint[0], self._load())
+            self._fingerprint = fingerprint
+            print("Vectorstore loaded successfully.")
+            return self._state
@@ -0,0 +1,5 @@
+if __name__ == "__main__":
+    # The app is imported only here: parse workers of bulk uploads re-import this
+    # script as __mp_main__ and must not build the app's models, pools and scheduler
+    from app import app
+    app.run(port=5000, debug=True)
@@ -0,0 +1,125 @@
+from collections import OrderedDict
+from typing import List, Optional
+import numpy as np
+import threading
+import time
+
+
+class SemanticCache:
+    def __init__(self, threshold: float = 0.95, max_entries: int = 1000, ttl_seconds: float = 24 * 3600):
+        """
+        In-memory cache of answers keyed by question embedding.
+
+        A lookup returns the cached answer of the most similar previous question
+        if its cosine similarity is at least `threshold`. Entries are evicted in
+        LRU order once `max_entries` is reached, expire after `ttl_seconds`, and
+        the whole cache is dropped when the index generation changes.
+
+        Args:
+            threshold: Minimum cosine similarity for a hit (default: 0.95)
+            max_entries: Maximum number of cached answers (default: 1000)
+            ttl_seconds: Lifetime of a cached answer in seconds (default: 1 day)
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> {"question", "answer", "vector", "created"}
+        self._next_key = 0
+        self._generation = None
+        self._matrix = None  # stacked vectors of _entries, rebuilt lazily
+        self._matrix_keys = []
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_generation(self, generation):
+        if generation != self._generation:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._matrix = None
+            self._generation = generation
+
+    def _expire(self, now: float):
+        expired = [key for key, entry in self._entries.items() if now - entry["created"] > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
+
+    def _rebuild_matrix(self):
+        self._matrix_keys = list(self._entries.keys())
+        if self._matrix_keys:
+            self._matrix = np.stack([self._entries[key]["vector"] for key in self._matrix_keys])
+        else:
+            self._matrix = np.empty((0, 0), dtype=np.float32)
+
+    def lookup(self, query_vector: List[float], generation) -> Optional[str]:
+        """
+        Return the cached answer for a similar question, or None on a miss.
+
+        Args:
+            query_vector: Embedding of the incoming question
+            generation: Current index generation; a change invalidates the cache
+        """
+        vector = self._normalize(query_vector)
+        with self._lock:
+            self._check_generation(generation)
+            self._expire(time.time())
+            if not self._entries:
+                self.misses += 1
+                return None
+            if self._matrix is None:
+                self._rebuild_matrix()
+
+            similarities = self._matrix @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            key = self._matrix_keys[best]
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]["answer"]
+
+    def store(self, question: str, query_vector: List[float], answer: str, generation):
+        """Cache an answer for a question answered against `generation`."""
+        vector = self._normalize(query_vector)
+        with self._lock:
+            self._check_generation(generation)
+            while len(self._entries) >= self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._entries[self._next_key] = {
+                "question": question,
+                "answer": answer,
+                "vector": vector,
+                "created": time.time()
+            }
+            self._next_key += 1
+            self._matrix = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl_seconds,
+                "generation": self._generation
+            }
@@ -0,0 +1,258 @@
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.vectorstores import VectorStore
+from langchain_core.documents import Document
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+import threading
+import fcntl
+import shutil
+import json
+import uuid
+import os
+
+GENERATION_FILE = "generation"
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = ".manifest.lock"
+LEGACY_BASE = "."  # index.faiss / index.pkl directly inside the vectorstore directory
+
+
+def read_generation(vectorstore_directory: str) -> int:
+    """Return the index generation counter written by the uploader (0 if none)."""
+    try:
+        with open(os.path.join(vectorstore_directory, GENERATION_FILE), 'r') as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def bump_generation(vectorstore_directory: str) -> int:
+    """
+    Increment the index generation counter after a new index has been written.
+
+    The counter is written to a temporary file and renamed into place so readers
+    never observe a partially written value.
+    """
+    generation = read_generation(vectorstore_directory) + 1
+    path = os.path.join(vectorstore_directory, GENERATION_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(str(generation))
+    os.replace(tmp_path, path)
+    return generation
+
+
+class ShardedIndex:
+    def __init__(self, vectorstore_directory: str, embeddings):
+        """
+        Append-only FAISS index made of one base shard and any number of delta shards.
+
+        Uploads are written as small delta shards so their cost is proportional to
+        the new document; compact() periodically merges the deltas into a new base.
+        The set of live shards is recorded in manifest.json, which is replaced
+        atomically, so readers always see a consistent shard list. Writers update
+        it under an exclusive lock on .manifest.lock, so appends and compactions
+        from different processes (e.g. gunicorn workers) do not lose shards.
+
+        Args:
+            vectorstore_directory: Directory holding the manifest and shard directories
+            embeddings: Embeddings used to embed new chunks and load shards
+        """
+        self.vectorstore_directory = os.path.abspath(vectorstore_directory)
+        self.embeddings = embeddings
+        self._lock = threading.Lock()  # serializes manifest updates within this process
+
+    def _path(self, *parts) -> str:
+        return os.path.join(self.vectorstore_directory, *parts)
+
+    @contextmanager
+    def _manifest_lock(self):
+        """Hold the manifest for a read-modify-write, across threads and processes."""
+        with self._lock:
+            os.makedirs(self.vectorstore_directory, exist_ok=True)
+            with open(self._path(LOCK_FILE), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def manifest_path(self) -> str:
+        return self._path(MANIFEST_FILE)
+
+    def read_manifest(self) -> dict:
+        try:
+            with open(self.manifest_path(), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            # Indexes written before sharding are a single base shard
+            has_legacy_base = os.path.exists(self._path("index.faiss"))
+            return {"base": LEGACY_BASE if has_legacy_base else None, "deltas": [], "next_shard": 1}
+
+    def _write_manifest(self, manifest: dict, bump: bool = True):
+        tmp_path = f"{self.manifest_path()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path())
+        if bump:
+            bump_generation(self.vectorstore_directory)
+
+    @staticmethod
+    def shard_paths(manifest: dict) -> List[str]:
+        base = [manifest["base"]] if manifest.get("base") else []
+        return base + manifest.get("deltas", [])
+
+    def exists(self) -> bool:
+        return bool(self.shard_paths(self.read_manifest()))
+
+    def load_shard(self, shard: str) -> FAISS:
+        return FAISS.load_local(
+            folder_path=self._path(shard),
+            embeddings=self.embeddings,
+            allow_dangerous_deserialization=True
+        )
+
+    def _write_shard(self, vectorstore: FAISS, shard: str):
+        """Save to a private staging directory, then rename it into place."""
+        staging_directory = self._path(".staging", uuid.uuid4().hex)
+        vectorstore.save_local(folder_path=staging_directory)
+        os.makedirs(os.path.dirname(self._path(shard)), exist_ok=True)
+        os.rename(staging_directory, self._path(shard))
+
+    def _remove_shard(self, shard: str):
+        if shard == LEGACY_BASE:
+            for name in ("index.faiss", "index.pkl"):
+                if os.path.exists(self._path(name)):
+                    os.remove(self._path(name))
+        else:
+            shutil.rmtree(self._path(shard), ignore_errors=True)
+
+    def append(self, documents: List, vectors: Optional[List[List[float]]] = None) -> str:
+        """
+        Embed documents into a new delta shard and publish it.
+
+        Args:
+            documents: Chunks to add to the index
+            vectors: Precomputed embeddings of the chunks, if already available
+
+        Returns:
+            str: Name of the new delta shard
+        """
+        if vectors is None:
+            vectorstore = FAISS.from_documents(documents, self.embeddings)
+        else:
+            vectorstore = FAISS.from_embeddings(
+                list(zip([doc.page_content for doc in documents], vectors)),
+                self.embeddings,
+                metadatas=[doc.metadata for doc in documents]
+            )
+        with self._manifest_lock():
+            manifest = self.read_manifest()
+            shard = f"deltas/{manifest['next_shard']:06d}"
+            self._write_shard(vectorstore, shard)
+            manifest["deltas"] = manifest["deltas"] + [shard]
+            manifest["next_shard"] += 1
+            self._write_manifest(manifest)
+        return shard
+
+    def compact(self, min_deltas: int = 1) -> bool:
+        """
+        Merge the base and current delta shards into a new base shard.
+
+        The merge runs outside the manifest lock, so uploads can keep appending
+        deltas meanwhile; those are carried over into the new manifest.
+
+        The merged shards are only deleted by the next compaction, so readers
+        still loading the previous manifest can finish. The generation is not
+        bumped, as the indexed content is unchanged.
+
+        Args:
+            min_deltas: Skip compaction if fewer delta shards exist (default: 1)
+
+        Returns:
+            bool: Whether a compaction was performed
+        """
+        with self._manifest_lock():
+            manifest = self.read_manifest()
+            if len(manifest["deltas"]) < min_deltas:
+                return False
+            merged_shards = self.shard_paths(manifest)
+        base = f"base/{uuid.uuid4().hex[:12]}"
+
+        print(f"Compacting {len(merged_shards)} index shards into {base}...")
+        merged = self.load_shard(merged_shards[0])
+        for shard in merged_shards[1:]:
+            merged.merge_from(self.load_shard(shard))
+        self._write_shard(merged, base)
+
+        with self._manifest_lock():
+            manifest = self.read_manifest()
+            retired = manifest.get("retired", [])
+            manifest["base"] = base
+            manifest["deltas"] = [d for d in manifest["deltas"] if d not in merged_shards]
+            manifest["retired"] = merged_shards
+            self._write_manifest(manifest, bump=False)
+        # Shards retired by the previous compaction are no longer in any published manifest
+        for shard in retired:
+            self._remove_shard(shard)
+        print("Compaction finished.")
+        return True
+
+
+class ShardedFAISS(VectorStore):
+    """View searching several FAISS shards and merging their top-k results.
+
+    Searches only; new documents are written through ShardedIndex.append,
+    which from_texts() also uses.
+    """
+
+    def __init__(self, shards: List[FAISS], embeddings):
+        self.shards = shards
+        self._embeddings = embeddings
+
+    @property
+    def embeddings(self):
+        return self._embeddings
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4,
+                                               **kwargs) -> List[Tuple]:
+        results = []
+        for shard in self.shards:
+            results.extend(shard.similarity_search_with_score_by_vector(embedding, k=k, **kwargs))
+        # FAISS scores are distances unless the index uses inner product
+        higher_is_better = bool(self.shards) and \
+            self.shards[0].distance_strategy == DistanceStrategy.MAX_INNER_PRODUCT
+        results.sort(key=lambda result: result[1], reverse=higher_is_better)
+        return results[:k]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs) -> List:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k=k, **kwargs)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs) -> List[Tuple]:
+        return self.similarity_search_with_score_by_vector(self._embeddings.embed_query(query), k=k, **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> List:
+        return self.similarity_search_by_vector(self._embeddings.embed_query(query), k=k, **kwargs)
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas: Optional[List[dict]] = None,
+                   vectorstore_directory: Optional[str] = None, **kwargs) -> "ShardedFAISS":
+        """
+        Add texts to the sharded index in `vectorstore_directory` and return a view of all its shards.
+
+        The texts become a new shard (the first one of an empty index), so
+        existing shards are kept.
+
+        Args:
+            texts: Texts to index
+            embedding: Embeddings used to embed the texts and load the shards
+            metadatas: Metadata of each text
+            vectorstore_directory: Directory of the sharded index (required)
+        """
+        if vectorstore_directory is None:
+            raise ValueError("ShardedFAISS.from_texts needs the vectorstore_directory of the sharded index")
+        index = ShardedIndex(vectorstore_directory, embedding)
+        metadatas = metadatas or [{} for _ in texts]
+        index.append([Document(page_content=text, metadata=meta) for text, meta in zip(texts, metadatas)])
+        shards = [index.load_shard(shard) for shard in index.shard_paths(index.read_manifest())]
+        return cls(shards, embedding)
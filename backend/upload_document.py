@@ -1,83 +1,221 @@
-from langchain_community.document_loaders import PyPDFLoader, TextLoader, Docx2txtLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
-from typing import List
+from sharded_index import ShardedIndex
+from document_parsing import load_document, split_documents, load_and_split
+from data_ingestion.src.common.embedding_cache import EmbeddingCache, CachedEmbeddings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import nullcontext
+from typing import Callable, List, Optional
+import multiprocessing
+import threading
+import time
 import os
 
+# Parse workers must not be forked from the app process: its scheduler and
+# SQLite threads may hold locks at fork time, which would deadlock the child
+PARSE_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+# Modules imported once by the fork server, so each parse worker starts with the loaders in memory
+PARSE_PRELOAD = ["document_parsing"]
+
 class DocumentUploader:
-    def __init__(self, vectorstore_directory: str = "Database"):
+    def __init__(self, vectorstore_directory: str = "Database",
+                 embedding_cache_path: str = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3"),
+                 embedding_batch_size: int = 256,
+                 parse_workers: Optional[int] = None,
+                 metrics=None):
         """
         Initialize DocumentUploader with the directory for the vector store.
-        
+
         Args:
             vectorstore_directory: Directory to store vector databases (default: "Database")
+            embedding_cache_path: SQLite file caching chunk embeddings across uploads
+                (default: $EMBEDDING_CACHE_PATH or "embedding_cache.sqlite3")
+            embedding_batch_size: Number of chunks embedded per request (default: 256)
+            parse_workers: Processes used to parse files in bulk uploads (default: CPU count).
+                The pool is started on the first bulk upload and kept until shutdown()
+            metrics: Optional StageMetrics recording the duration of each upload stage
         """
         self.vectorstore_directory = os.path.abspath(vectorstore_directory)
         os.makedirs(self.vectorstore_directory, exist_ok=True)
-        self.embeddings = OpenAIEmbeddings()  # Initialize embeddings once
-
-    def _get_loader(self, file_path: str):
-        """Determine the appropriate loader based on file extension"""
-        file_extension = os.path.splitext(file_path)[1].lower()
-        loader_map = {
-            '.pdf': PyPDFLoader,
-            '.txt': TextLoader,
-            '.docx': Docx2txtLoader
+        # Initialize embeddings once; chunks embedded before are served from the cache
+        self.embeddings = CachedEmbeddings(OpenAIEmbeddings(), EmbeddingCache(embedding_cache_path))
+        self.index = ShardedIndex(self.vectorstore_directory, self.embeddings)
+        self.embedding_batch_size = embedding_batch_size
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.metrics = metrics
+        self._parse_pool = None
+        self._parse_pool_lock = threading.Lock()
+
+    def _get_parse_pool(self) -> ProcessPoolExecutor:
+        with self._parse_pool_lock:
+            if self._parse_pool is None:
+                context = multiprocessing.get_context(PARSE_START_METHOD)
+                if PARSE_START_METHOD == "forkserver":
+                    context.set_forkserver_preload(PARSE_PRELOAD)
+                self._parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers, mp_context=context)
+            return self._parse_pool
+
+    def _reset_parse_pool(self, pool: ProcessPoolExecutor):
+        """Drop a broken pool (e.g. a worker was killed) so the next bulk upload starts a new one."""
+        with self._parse_pool_lock:
+            if self._parse_pool is pool:
+                self._parse_pool = None
+        pool.shutdown(wait=False)
+
+    def shutdown(self):
+        with self._parse_pool_lock:
+            pool, self._parse_pool = self._parse_pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _timer(self, stage: str):
+        return self.metrics.timer("upload", stage) if self.metrics else nullcontext()
+
+    def _embed_chunks(self, chunks: List, report: Callable) -> List[List[float]]:
+        """Embed chunks in batches so progress can be reported for large uploads."""
+        report("embed", chunks_embedded=0, chunks_total=len(chunks))
+        vectors = []
+        for start in range(0, len(chunks), self.embedding_batch_size):
+            batch = chunks[start:start + self.embedding_batch_size]
+            vectors.extend(self.embeddings.embed_documents([chunk.page_content for chunk in batch]))
+            report("embed", chunks_embedded=len(vectors), chunks_total=len(chunks))
+        return vectors
+
+    def process_document(self, file_path: str, progress: Optional[Callable] = None) -> int:
+        """
+        Load, split, embed and index a single document.
+
+        Args:
+            file_path: Path of the document to process
+            progress: Optional callback invoked as progress(stage, **info) when a
+                stage starts ("parse", "embed", "index") and after each
+                embedding batch (with chunks_embedded / chunks_total)
+
+        Returns:
+            int: Number of chunks added to the index
+
+        Raises:
+            FileNotFoundError: If the file does not exist
+            ValueError: If the file type is unsupported or yields no text
+        """
+        report = progress or (lambda stage, **info: None)
+
+        # Load and split documents
+        report("parse")
+        with self._timer("load"):
+            documents = load_document(file_path)
+        with self._timer("split"):
+            chunks = split_documents(file_path, documents)
+        with self._timer("embed"):
+            vectors = self._embed_chunks(chunks, report)
+
+        # Append the chunks as a new delta shard; compaction merges it later
+        report("index")
+        with self._timer("index_write"):
+            self.index.append(chunks, vectors)
+        return len(chunks)
+
+    def upload_documents_bulk(self, file_paths: List[str], progress: Optional[Callable] = None) -> dict:
+        """
+        Process many documents with parallel parsing and a single index commit.
+
+        Files are loaded and split in a process pool, the chunks of all files are
+        embedded in shared batches, and everything is appended as one shard.
+
+        Args:
+            file_paths: List of file paths to process
+            progress: Optional callback, as for process_document()
+
+        Returns:
+            dict: {"files": per-file outcomes, "stats": aggregate throughput stats}
+        """
+        report = progress or (lambda stage, **info: None)
+        started = time.perf_counter()
+        outcomes = {path: {"file": path, "status": "failed", "chunks": 0, "error": None} for path in file_paths}
+        chunks_by_file = {}
+
+        # Parse files in parallel; PDF parsing is CPU bound
+        report("parse", files_parsed=0, files_total=len(file_paths))
+        workers = min(self.parse_workers, len(file_paths))
+        if workers > 1:
+            pool = self._get_parse_pool()
+            futures = {pool.submit(load_and_split, path): path for path in file_paths}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    chunks_by_file[path] = future.result()
+                except BrokenProcessPool as e:
+                    outcomes[path]["error"] = str(e)
+                    self._reset_parse_pool(pool)
+                except Exception as e:
+                    outcomes[path]["error"] = str(e)
+                report("parse", files_parsed=len(chunks_by_file), files_total=len(file_paths))
+        else:
+            for path in file_paths:
+                try:
+                    chunks_by_file[path] = load_and_split(path)
+                except Exception as e:
+                    outcomes[path]["error"] = str(e)
+        parsed = embedded = time.perf_counter()
+        if self.metrics:
+            # Loading and splitting run together in the worker processes
+            self.metrics.observe("upload_bulk", "parse", parsed - started)
+
+        # Embed all files together and commit the index once
+        all_chunks = [chunk for path in file_paths for chunk in chunks_by_file.get(path, [])]
+        if all_chunks:
+            try:
+                vectors = self._embed_chunks(all_chunks, report)
+                embedded = time.perf_counter()
+                report("index")
+                self.index.append(all_chunks, vectors)
+                if self.metrics:
+                    self.metrics.observe("upload_bulk", "embed", embedded - parsed)
+                    self.metrics.observe("upload_bulk", "index_write", time.perf_counter() - embedded)
+                for path, chunks in chunks_by_file.items():
+                    outcomes[path].update(status="succeeded", chunks=len(chunks))
+            except Exception as e:
+                for path in chunks_by_file:
+                    outcomes[path]["error"] = str(e)
+        finished = time.perf_counter()
+
+        for outcome in outcomes.values():
+            if outcome["status"] == "succeeded":
+                print(f"Successfully processed: {outcome['file']}")
+            else:
+                print(f"Error processing {outcome['file']}: {outcome['error']}")
+
+        succeeded = [o for o in outcomes.values() if o["status"] == "succeeded"]
+        total_bytes = sum(os.path.getsize(o["file"]) for o in succeeded if os.path.exists(o["file"]))
+        total_seconds = finished - started
+        chunks_indexed = sum(o["chunks"] for o in succeeded)
+        return {
+            "files": [outcomes[path] for path in file_paths],
+            "stats": {
+                "files": len(file_paths),
+                "succeeded": len(succeeded),
+                "failed": len(file_paths) - len(succeeded),
+                "chunks": chunks_indexed,
+                "bytes": total_bytes,
+                "parse_seconds": round(parsed - started, 3),
+                "embed_seconds": round(embedded - parsed, 3),
+                "index_seconds": round(finished - embedded, 3),
+                "total_seconds": round(total_seconds, 3),
+                "files_per_second": round(len(succeeded) / total_seconds, 3) if total_seconds else None,
+                "chunks_per_second": round(chunks_indexed / total_seconds, 3) if total_seconds else None,
+                "mb_per_second": round(total_bytes / 1e6 / total_seconds, 3) if total_seconds else None
+            }
         }
-        return loader_map.get(file_extension)
 
     def upload_documents(self, file_paths: List[str]):
         """
         Process and upload multiple documents to the vector store.
-        
+
         Args:
             file_paths: List of file paths to process
-            
+
         Returns:
             Tuple: (success_count, error_count)
         """
-        success_count = 0
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,  # Slightly larger chunks
-            chunk_overlap=200,
-            length_function=len
-        )
-
-        for file_path in file_paths:
-            try:
-                if not os.path.exists(file_path):
-                    print(f"File not found: {file_path}")
-                    continue
-
-                Loader = self._get_loader(file_path)
-                if not Loader:
-                    print(f"Unsupported file type: {file_path}")
-                    continue
-
-                # Load and split documents
-                documents = Loader(file_path).load()
-                chunks = text_splitter.split_documents(documents)
-
-                # Create or update FAISS index
-                if os.path.exists(os.path.join(self.vectorstore_directory, "index.faiss")):
-                    # Load existing vectorstore and merge new documents
-                    vectorstore = FAISS.load_local(
-                        folder_path=self.vectorstore_directory,
-                        embeddings=self.embeddings,
-                        allow_dangerous_deserialization=True
-                    )
-                    vectorstore.add_documents(chunks)
-                else:
-                    # Create new vectorstore
-                    vectorstore = FAISS.from_documents(chunks, self.embeddings)
-
-                # Save the updated vectorstore
-                vectorstore.save_local(folder_path=self.vectorstore_directory)
-                success_count += 1
-                print(f"Successfully processed: {file_path}")
-
-            except Exception as e:
-                print(f"Error processing {file_path}: {str(e)}")
-
-        return success_count, len(file_paths) - success_count
\ No newline at end of file
+        stats = self.upload_documents_bulk(file_paths)["stats"]
+        return stats["succeeded"], stats["failed"]
@@ -0,0 +1,62 @@
+from flask import Request
+from hashlib import md5
+from typing import Tuple
+import shutil
+import uuid
+import os
+
+
+class HashingUpload:
+    def __init__(self, temp_dir: str, filename: str):
+        """
+        Writable stream receiving one uploaded file while the request is parsed.
+
+        The file is written straight into its own temporary directory (so
+        identical filenames cannot collide) and hashed as it is written, so it
+        is neither spooled nor read back a second time.
+
+        Args:
+            temp_dir: Directory under which the per-upload directory is created
+            filename: Client filename of the upload
+        """
+        self.directory = os.path.join(temp_dir, uuid.uuid4().hex)
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, os.path.basename(filename or "") or "upload")
+        self.claimed = False  # set once an ingestion job owns the file
+        self._hash = md5()
+        self._file = open(self.path, 'w+b')
+
+    def write(self, data: bytes) -> int:
+        self._hash.update(data)
+        return self._file.write(data)
+
+    def __getattr__(self, name):
+        # read/seek/tell/close are served by the underlying file
+        return getattr(self._file, name)
+
+    def finish(self) -> Tuple[str, str]:
+        """Close the file and return (path, md5 hex digest)."""
+        self._file.close()
+        return self.path, self._hash.hexdigest()
+
+    def discard(self):
+        self._file.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class UploadRequest(Request):
+    """Request whose files, on `upload_paths`, are received into HashingUpload streams."""
+
+    temp_dir = "temp"
+    upload_paths = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upload_streams = []
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.path not in self.upload_paths:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        stream = HashingUpload(self.temp_dir, filename)
+        self.upload_streams.append(stream)
+        return stream